@@ -27,6 +27,7 @@
 # ## dependencies are validated
 # * `schedule` only supports: `On trigger | Continuous | <cron expression> | null`
 
+from datetime import timedelta
 from typing import Optional
 
 import click
@@ -35,8 +36,24 @@ from pydantic import ValidationError
 
 from . import __version__
 from .app_config import CommandMode
-from .app_exceptions import ExtpipesConfigError
+from .app_exceptions import (
+    ExtpipesConfigError,
+    ExtpipesLockError,
+    ExtpipesSupersededError,
+)
 from .commands.deploy import CommandDeploy
+from .commands.diagram import CommandDiagram, DiagramFormat
+from .commands.drift import CommandDrift, DriftFormat
+from .commands.query import CommandQuery, IndexKind, cached_config_index
+from .commands.status import CommandStatus
+from .common.reports import ReportFormat
+
+# exit-code of 'drift' command, if configuration and CDF differ
+# distinct from the exit-codes used for configuration errors (126, 127)
+DRIFT_DETECTED_EXIT_CODE = 3
+
+# exit-code of 'deploy' command, if the deploy lock could not be acquired or got lost
+DEPLOY_LOCK_EXIT_CODE = 4
 
 # '''
 #           888 d8b          888
@@ -119,6 +136,22 @@ from .commands.deploy import CommandDeploy
     is_flag=True,
     help="Log only planned CDF API actions while doing nothing. Defaults to False.",
 )
+@click.option(
+    "--record",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Record all CDF API requests and responses (w/o secrets) to this file, '.gz' suffix for compression.",
+)
+@click.option(
+    "--replay",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Replay CDF API responses from a recording, w/o connecting to CDF or the IdP.",
+)
+@click.option(
+    "--replay-latency-scale",
+    type=click.FloatRange(min=0),
+    default=1.0,
+    help="Factor applied to the recorded latencies when replaying, 0 replays w/o delay. Defaults to 1.0.",
+)
 @click.pass_context
 def extpipes_cli(
     # click.core.Context
@@ -138,7 +171,13 @@ def extpipes_cli(
     dotenv_path: Optional[str] = None,
     debug: bool = False,
     dry_run: bool = False,
+    record: Optional[str] = None,
+    replay: Optional[str] = None,
+    replay_latency_scale: float = 1.0,
 ) -> None:
+    if record and replay:
+        raise click.UsageError("'--record' and '--replay' can't be used together", ctx=context)
+
     context.obj = {
         # cdf
         "cluster": cluster,
@@ -154,6 +193,9 @@ def extpipes_cli(
         "dotenv_path": dotenv_path,
         "debug": debug,
         "dry_run": dry_run,
+        "record_path": record,
+        "replay_path": replay,
+        "replay_latency_scale": replay_latency_scale,
     }
 
 
@@ -167,8 +209,34 @@ def extpipes_cli(
     is_flag=True,
     help="Delete extpipes which are not specified in config-file",
 )
+@click.option(
+    "--streaming",
+    is_flag=True,
+    help="Plan and apply in chunks with bounded memory, for very large configurations. "
+    "Unchanged Extraction Pipelines are not updated.",
+)
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1, max=1000),
+    default=1000,
+    help="Number of Extraction Pipelines per chunk in streaming mode. Defaults to 1000.",
+)
+@click.option(
+    "--revision",
+    type=click.IntRange(min=0),
+    envvar="EXTPIPES_REVISION",
+    help="Revision of the configuration (e.g. the CI run number), used with 'features.deploy-lock'. "
+    "Runs of older revisions are superseded by newer ones. Runs w/o a revision only wait for the lock.",
+)
 @click.pass_obj
-def deploy(obj: dict, config_file: str, automatic_delete: bool = True) -> None:
+def deploy(
+    obj: dict,
+    config_file: str,
+    automatic_delete: bool = True,
+    streaming: bool = False,
+    chunk_size: int = 1000,
+    revision: Optional[int] = None,
+) -> None:
     click.echo(click.style("Deploying Extraction Pipelines...", fg="green"))
 
     try:
@@ -178,9 +246,16 @@ def deploy(obj: dict, config_file: str, automatic_delete: bool = True) -> None:
             debug=obj["debug"],
             dry_run=obj["dry_run"],
             dotenv_path=obj["dotenv_path"],
+            record_path=obj["record_path"],
+            replay_path=obj["replay_path"],
+            replay_latency_scale=obj["replay_latency_scale"],
         )
-        command.validate_config()
-        command.command()
+        with command.deploy_lock(revision):
+            command.validate_config()
+            if streaming:
+                command.command_streaming(chunk_size=chunk_size)
+            else:
+                command.command()
 
         click.echo(click.style("Extraction Pipelines deployed", fg="green"))
     except ValidationError as e:
@@ -191,9 +266,283 @@ def deploy(obj: dict, config_file: str, automatic_delete: bool = True) -> None:
     except ExtpipesConfigError as e:
         click.echo(click.style(e.message, fg="red"))
         exit(code=127)
+    except ExtpipesLockError as e:
+        click.echo(click.style(e.message, fg="red"))
+        exit(code=DEPLOY_LOCK_EXIT_CODE)
+    except ExtpipesSupersededError as e:
+        # not an error, the run of the newer revision deploys
+        click.echo(click.style(e.message, fg="yellow"))
+
+
+@click.command(help="Detect drift between a configuration file and the Extraction Pipelines in CDF")
+@click.argument(
+    "config-file",
+    default="./config-extpipes.yml",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice([_f.value for _f in DriftFormat]),
+    default=DriftFormat.JSON.value,
+    help="Output format of the drift report. Defaults to 'json'.",
+)
+@click.option(
+    "--output",
+    type=click.File("w"),
+    default="-",
+    help="File to write the drift report to. Defaults to stdout.",
+)
+@click.pass_obj
+def drift(obj: dict, config_file: str, output_format: str, output) -> None:
+    # stdout is reserved for the report
+    click.echo(click.style("Detecting drift of Extraction Pipelines...", fg="green"), err=True)
+
+    try:
+        command = CommandDrift(
+            config_file,
+            command=CommandMode.DRIFT,
+            debug=obj["debug"],
+            dry_run=obj["dry_run"],
+            dotenv_path=obj["dotenv_path"],
+            record_path=obj["record_path"],
+            replay_path=obj["replay_path"],
+            replay_latency_scale=obj["replay_latency_scale"],
+        )
+        command.validate_config()
+        report = command.command()
+
+        click.echo(CommandDrift.render(report, DriftFormat(output_format)), file=output)
+    except ValidationError as e:
+        for error in e.errors():
+            field_path = ".".join(map(str, error["loc"]))  # Convert tuple path (including indices) to dot notation
+            click.echo(f"Error in field '{field_path}': {error['msg']}", err=True)
+        exit(code=126)
+    except ExtpipesConfigError as e:
+        click.echo(click.style(e.message, fg="red"), err=True)
+        exit(code=127)
+
+    if report["drifted"]:
+        exit(code=DRIFT_DETECTED_EXIT_CODE)
+
+
+@click.command(help="Report the latest run status of all Extraction Pipelines from a configuration file")
+@click.argument(
+    "config-file",
+    default="./config-extpipes.yml",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice([_f.value for _f in ReportFormat]),
+    default=ReportFormat.JSON.value,
+    help="Output format of the status report. Defaults to 'json'.",
+)
+@click.option(
+    "--output",
+    type=click.File("w"),
+    default="-",
+    help="File to write the status report to. Defaults to stdout.",
+)
+@click.option(
+    "--grace-minutes",
+    type=click.IntRange(min=0),
+    default=10,
+    help="Minutes an Extraction Pipeline can exceed its schedule before being reported as late. Defaults to 10.",
+)
+@click.pass_obj
+def status(obj: dict, config_file: str, output_format: str, output, grace_minutes: int) -> None:
+    # stdout is reserved for the report
+    click.echo(click.style("Collecting status of Extraction Pipelines...", fg="green"), err=True)
+
+    try:
+        command = CommandStatus(
+            config_file,
+            command=CommandMode.STATUS,
+            debug=obj["debug"],
+            dry_run=obj["dry_run"],
+            dotenv_path=obj["dotenv_path"],
+            record_path=obj["record_path"],
+            replay_path=obj["replay_path"],
+            replay_latency_scale=obj["replay_latency_scale"],
+        )
+        report = command.command(grace=timedelta(minutes=grace_minutes))
+
+        click.echo(CommandStatus.render(report, ReportFormat(output_format)), file=output)
+    except ValidationError as e:
+        for error in e.errors():
+            field_path = ".".join(map(str, error["loc"]))  # Convert tuple path (including indices) to dot notation
+            click.echo(f"Error in field '{field_path}': {error['msg']}", err=True)
+        exit(code=126)
+    except ExtpipesConfigError as e:
+        click.echo(click.style(e.message, fg="red"), err=True)
+        exit(code=127)
+
+
+@click.command(help="Diagram of data sets, Extraction Pipelines, RAW tables and contacts from a configuration file")
+@click.argument(
+    "config-file",
+    default="./config-extpipes.yml",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice([_f.value for _f in DiagramFormat]),
+    default=DiagramFormat.MERMAID.value,
+    help="Output format of the diagram. Defaults to 'mermaid'.",
+)
+@click.option(
+    "--output",
+    type=click.File("w"),
+    default="-",
+    help="File to write the diagram to. Defaults to stdout.",
+)
+@click.option("--data-set", multiple=True, help="Only include Extraction Pipelines of this data set external-id.")
+@click.option("--raw-db", multiple=True, help="Only include Extraction Pipelines writing to this RAW database.")
+@click.option("--contact", multiple=True, help="Only include Extraction Pipelines with this contact email.")
+@click.option(
+    "--external-id",
+    multiple=True,
+    help="Only include Extraction Pipelines with an external-id matching this pattern (supports '*' and '?').",
+)
+@click.option("--no-contacts", is_flag=True, help="Leave out contacts from the diagram.")
+@click.option("--live", is_flag=True, help="Mark Extraction Pipelines with their latest run status from CDF.")
+@click.pass_obj
+def diagram(
+    obj: dict,
+    config_file: str,
+    output_format: str,
+    output,
+    data_set: tuple[str, ...],
+    raw_db: tuple[str, ...],
+    contact: tuple[str, ...],
+    external_id: tuple[str, ...],
+    no_contacts: bool = False,
+    live: bool = False,
+) -> None:
+    # stdout is reserved for the diagram
+    click.echo(click.style("Generating diagram of Extraction Pipelines...", fg="green"), err=True)
+
+    try:
+        command = CommandDiagram(
+            config_file,
+            command=CommandMode.DIAGRAM,
+            debug=obj["debug"],
+            dry_run=obj["dry_run"],
+            dotenv_path=obj["dotenv_path"],
+            record_path=obj["record_path"],
+            replay_path=obj["replay_path"],
+            replay_latency_scale=obj["replay_latency_scale"],
+        )
+        output.writelines(
+            command.command(
+                format=DiagramFormat(output_format),
+                data_sets=data_set,
+                raw_dbs=raw_db,
+                contacts=contact,
+                external_id_patterns=external_id,
+                with_contacts=not no_contacts,
+                live=live,
+            )
+        )
+    except ValidationError as e:
+        for error in e.errors():
+            field_path = ".".join(map(str, error["loc"]))  # Convert tuple path (including indices) to dot notation
+            click.echo(f"Error in field '{field_path}': {error['msg']}", err=True)
+        exit(code=126)
+    except ExtpipesConfigError as e:
+        click.echo(click.style(e.message, fg="red"), err=True)
+        exit(code=127)
+
+
+@click.command(help="Query Extraction Pipelines from a configuration file by data set, RAW table, contact, ...")
+@click.argument(
+    "config-file",
+    default="./config-extpipes.yml",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice([_f.value for _f in ReportFormat]),
+    default=ReportFormat.TABLE.value,
+    help="Output format of the query result. Defaults to 'table'.",
+)
+@click.option(
+    "--output",
+    type=click.File("w"),
+    default="-",
+    help="File to write the query result to. Defaults to stdout.",
+)
+@click.option("--data-set", multiple=True, help="Extraction Pipelines of this data set external-id.")
+@click.option("--raw-db", multiple=True, help="Extraction Pipelines writing to this RAW database.")
+@click.option("--raw-table", multiple=True, help="Extraction Pipelines writing to this RAW table, as '<db>/<table>'.")
+@click.option("--contact", multiple=True, help="Extraction Pipelines with this contact email.")
+@click.option("--metadata", multiple=True, help="Extraction Pipelines with this metadata '<key>' or '<key>=<value>'.")
+@click.option("--schedule", multiple=True, help="Extraction Pipelines with this schedule.")
+@click.option("--live", is_flag=True, help="Query the Extraction Pipelines in CDF too.")
+@click.pass_obj
+def query(
+    obj: dict,
+    config_file: str,
+    output_format: str,
+    output,
+    data_set: tuple[str, ...],
+    raw_db: tuple[str, ...],
+    raw_table: tuple[str, ...],
+    contact: tuple[str, ...],
+    metadata: tuple[str, ...],
+    schedule: tuple[str, ...],
+    live: bool = False,
+) -> None:
+    # stdout is reserved for the query result
+    click.echo(click.style("Querying Extraction Pipelines...", fg="green"), err=True)
+    filters = {
+        IndexKind.DATA_SET: data_set,
+        IndexKind.RAW_DB: raw_db,
+        IndexKind.RAW_TABLE: raw_table,
+        IndexKind.CONTACT: contact,
+        IndexKind.METADATA: metadata,
+        IndexKind.SCHEDULE: schedule,
+    }
+
+    try:
+        # the extpipes config is only validated, if its index isn't cached yet
+        # with a cached index, '--live' only uses the cognite config
+        cache, config_index = cached_config_index(config_file, dotenv_path=obj["dotenv_path"])
+        live_index = None
+        if config_index is None or live:
+            command = CommandQuery(
+                config_file,
+                command=CommandMode.QUERY,
+                debug=obj["debug"],
+                dry_run=obj["dry_run"],
+                dotenv_path=obj["dotenv_path"],
+                record_path=obj["record_path"],
+                replay_path=obj["replay_path"],
+                replay_latency_scale=obj["replay_latency_scale"],
+            )
+            if config_index is None:
+                config_index = command.build_config_index()
+                cache.save(config_index.dump())
+            if live:
+                live_index = command.build_live_index()
+
+        report = CommandQuery.query(config_index, filters, live_index)
+        click.echo(CommandQuery.render(report, ReportFormat(output_format)), file=output)
+    except ValidationError as e:
+        for error in e.errors():
+            field_path = ".".join(map(str, error["loc"]))  # Convert tuple path (including indices) to dot notation
+            click.echo(f"Error in field '{field_path}': {error['msg']}", err=True)
+        exit(code=126)
+    except ExtpipesConfigError as e:
+        click.echo(click.style(e.message, fg="red"), err=True)
+        exit(code=127)
 
 
 extpipes_cli.add_command(deploy)
+extpipes_cli.add_command(drift)
+extpipes_cli.add_command(status)
+extpipes_cli.add_command(diagram)
+extpipes_cli.add_command(query)
 
 
 def main() -> None:
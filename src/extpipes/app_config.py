@@ -1,20 +1,38 @@
+import gc
 import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
 from datetime import datetime
 from enum import ReprEnum  # new in 3.11
-from typing import Annotated, Optional
+from functools import lru_cache
+from typing import Annotated, Any, Iterator, Optional
 
 from jinja2 import Environment, meta
-from pydantic import Field, StringConstraints, field_validator, model_validator
+from pydantic import (
+    Field,
+    ModelWrapValidatorHandler,
+    StringConstraints,
+    TypeAdapter,
+    ValidationError,
+    field_validator,
+    model_validator,
+)
+from pydantic_core import InitErrorDetails
 from pydantic_core.core_schema import ValidationInfo
 
 from . import __version__
-from .common.base_model import Model
+from .common.base_model import Model, to_hyphen_case
+from .common.logging_utils import lazy
 
 
 class CommandMode(str, ReprEnum):
     DEPLOY = "deploy"
+    DRIFT = "drift"
+    STATUS = "status"
     # DELETE = "delete"
-    # DIAGRAM = "diagram"
+    DIAGRAM = "diagram"
+    QUERY = "query"
 
 
 CRON_OR_FIXED_PATTERN = (
@@ -25,6 +43,24 @@ CRON_OR_FIXED_PATTERN = (
 )
 
 
+@lru_cache(maxsize=1)
+def _timestamp(epoch_seconds: int) -> str:
+    # formatting the local time is slow, and the same for all pipelines validated within one second
+    return datetime.fromtimestamp(epoch_seconds).strftime("%Y-%m-%d %H:%M:%S")
+
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    # validation creates many objects and no cycles, which triggers full collections over and over
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
 class Contact(Model):
     name: str
     email: str
@@ -41,7 +77,9 @@ class Pipeline(Model):
     external_id: Optional[str] = Field(default=None)
     name: Optional[str] = Field(default=None)
     description: Optional[str] = Field(default=None)
-    data_set_external_id: str
+    # either the external-id of the data set, which is looked up in CDF, or its id
+    data_set_external_id: Optional[str] = Field(default=None)
+    data_set_id: Optional[int] = Field(default=None)
     schedule: Annotated[str, StringConstraints(pattern=CRON_OR_FIXED_PATTERN)]
     contacts: list[Contact] = Field(default=list())
     source: Optional[str] = Field(default=None)
@@ -51,11 +89,22 @@ class Pipeline(Model):
     raw_tables: list[RawTable] = Field(default=list())
     extpipe_config: Optional[dict[str, str]] = Field(default=None)
 
+    @property
+    def data_set_key(self) -> str:
+        """External-id of the data set, or its id if configured by id, e.g. to group pipelines by data set"""
+        return self.data_set_external_id if self.data_set_external_id is not None else str(self.data_set_id)
+
+    @model_validator(mode="after")
+    def check_data_set(self) -> "Pipeline":
+        if (self.data_set_external_id is None) == (self.data_set_id is None):
+            raise ValueError("Either 'data-set-external-id' or 'data-set-id' is required.")
+        return self
+
     @field_validator("metadata")
     @classmethod
     def ensure_metadata_to_have_version(cls, v: dict[str, str]) -> dict[str, str]:
         if "Dataops_created" not in v:
-            v["Dataops_created"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            v["Dataops_created"] = _timestamp(int(time.time()))
         if "Dataops_source" not in v:
             v["Dataops_source"] = f"extpipes-cli v{__version__}"
         return v
@@ -68,6 +117,25 @@ class Pipeline(Model):
         return v[:255] if v else None
 
 
+class DeployLockBackend(str, ReprEnum):
+    # a row in a CDF RAW table, shared by all runs against the same project
+    RAW = "raw"
+    # a local file, e.g. for runs on the same machine
+    FILE = "file"
+
+
+class DeployLockConfig(Model):
+    backend: DeployLockBackend = Field(default=DeployLockBackend.RAW)
+    raw_db: str = Field(default="extpipes-cli")
+    raw_table: str = Field(default="deploy-lock")
+    path: str = Field(default="./.extpipes-deploy.lock")
+    # a crashed run holds the lock until its lease expires, a running run renews its lease
+    lease_seconds: int = Field(default=300, ge=10)
+    # max time to wait for the lock, before giving up
+    wait_seconds: int = Field(default=1800, ge=0)
+    poll_seconds: int = Field(default=10, ge=1)
+
+
 class ExtpipesFeatures(Model):
     # jinja2 template to fill in both external_id and name
     naming_pattern: str = Field(default="")
@@ -78,10 +146,236 @@ class ExtpipesFeatures(Model):
     # with default values must come last
     default_contacts: list[Contact] = Field(default=list())
 
+    # lock of 'deploy' runs against the same project, disabled by default
+    deploy_lock: Optional[DeployLockConfig] = Field(default=None)
+
+
+# aliases of the alternative fields to configure the data set of a pipeline
+DATA_SET_FIELDS = {"data-set-external-id", "data-set-id"}
+
+
+# location of a value in the config, like ('groups', 0, 'pipelines', 3)
+Loc = tuple[str | int, ...]
+
+
+@lru_cache(maxsize=None)
+def _pipeline_field_adapter(name: str) -> TypeAdapter:
+    # validates a single field of templates and defaults, w/o the model validators of a complete Pipeline
+    field = Pipeline.model_fields[name]
+    return TypeAdapter(Annotated[(field.annotation, *field.metadata)] if field.metadata else field.annotation)
+
+
+def _init_error(error: Any) -> InitErrorDetails:
+    # 'ValidationError.errors()' items, as needed to raise them again with 'ValidationError.from_exception_data'
+    return {
+        "type": error["type"],
+        "loc": error["loc"],
+        "input": error["input"],
+        **({"ctx": error["ctx"]} if "ctx" in error else {}),  # type: ignore
+    }
+
+
+def _value_error(loc: Loc, value: Any, message: str) -> InitErrorDetails:
+    return {"type": "value_error", "loc": loc, "input": value, "ctx": {"error": ValueError(message)}}
+
+
+class _PipelineTemplates:
+    """Expands pipelines from a named template and the defaults of their group: pipeline fields overwrite
+    group defaults, which overwrite template fields, 'metadata' is merged.
+
+    Templates and group defaults are validated once up front, their contacts and raw-tables are shared by
+    all expanded pipelines. Their errors are collected with their location in the config, and pipelines using
+    an invalid template or defaults are left out, instead of reporting the same error for each of them.
+    The location of each expanded pipeline is kept, to report its errors where it is configured.
+    """
+
+    def __init__(self, templates: dict[str, Any]):
+        self.templates = templates
+        # None if invalid
+        self.prepared_templates: dict[str, Optional[dict[str, Any]]] = {}
+        self.prepared_defaults: dict[int, Optional[dict[str, Any]]] = {}
+        self.prepared: dict[tuple[Optional[str], int], Optional[dict[str, Any]]] = {}
+        self.errors: list[InitErrorDetails] = []
+        # references to unknown templates, reported once each
+        self.unknown_references: set[Loc] = set()
+        # location in the config of each expanded pipeline
+        self.sources: list[Loc] = []
+
+    def prepare(self, fields: Any, loc: Loc) -> Optional[dict[str, Any]]:
+        """Validate the fields of a template or defaults, and normalize them to aliases (hyphen-case)
+
+        Returns:
+            Optional[dict[str, Any]]: the fields with validated contacts and raw-tables, None if invalid
+        """
+        if not isinstance(fields, dict):
+            self.errors.append({"type": "dict_type", "loc": loc, "input": fields})
+            return None
+
+        prepared: dict[str, Any] = {}
+        errors: list[InitErrorDetails] = []
+        for key, value in fields.items():
+            # fields can be given by name or alias
+            alias, name = to_hyphen_case(key), key.replace("-", "_")
+            if name not in Pipeline.model_fields:
+                errors.append({"type": "extra_forbidden", "loc": (*loc, key), "input": value})
+                continue
+            try:
+                validated = _pipeline_field_adapter(name).validate_python(value)
+            except ValidationError as e:
+                errors.extend(_init_error({**_e, "loc": (*loc, key, *_e["loc"])}) for _e in e.errors())
+                continue
+            # only validated sub-objects are shared, other fields are validated with each pipeline
+            prepared[alias] = validated if alias in ("contacts", "raw-tables") else value
+
+        self.errors.extend(errors)
+        return None if errors else prepared
+
+    @staticmethod
+    def merge(base: dict[str, Any], fields: dict[str, Any]) -> dict[str, Any]:
+        if DATA_SET_FIELDS & fields.keys():
+            # a data set given by id replaces one given by external-id, and vice versa
+            base = {_k: _v for _k, _v in base.items() if _k not in DATA_SET_FIELDS}
+        merged = {**base, **fields}
+        if isinstance(base.get("metadata"), dict) and isinstance(fields.get("metadata"), dict):
+            merged["metadata"] = {**base["metadata"], **fields["metadata"]}
+        return merged
+
+    def template(self, name: str, reference: Loc) -> Optional[dict[str, Any]]:
+        if name not in self.templates:
+            if reference not in self.unknown_references:
+                self.unknown_references.add(reference)
+                self.errors.append(_value_error(reference, name, f"Unknown pipeline template: '{name}'"))
+            return None
+        if name not in self.prepared_templates:
+            self.prepared_templates[name] = self.prepare(self.templates[name], ("templates", name))
+        return self.prepared_templates[name]
+
+    def defaults(self, group: int, defaults: dict[str, Any]) -> Optional[dict[str, Any]]:
+        if group not in self.prepared_defaults:
+            fields = {_k: _v for _k, _v in defaults.items() if _k != "template"}
+            self.prepared_defaults[group] = self.prepare(fields, ("groups", group, "defaults"))
+        return self.prepared_defaults[group]
+
+    def base(self, template: Optional[str], reference: Loc, group: int, defaults: dict[str, Any]) -> Optional[dict]:
+        """Template merged with group defaults, 'group' -1 for top-level pipelines. None if any is invalid"""
+        if template is not None and template not in self.templates:
+            # reported at each reference
+            return self.template(template, reference)
+
+        if (template, group) not in self.prepared:
+            fields: Optional[dict[str, Any]] = {}
+            if template is not None:
+                fields = self.template(template, reference)
+            if fields is not None and defaults:
+                group_defaults = self.defaults(group, defaults)
+                fields = None if group_defaults is None else self.merge(fields, group_defaults)
+            self.prepared[(template, group)] = fields
+        return self.prepared[(template, group)]
+
+    def expand(self, pipeline: Any, loc: Loc, group: int = -1, defaults: Optional[dict[str, Any]] = None) -> Any:
+        """The pipeline merged with its template and group defaults, None if any of them is invalid"""
+        if not isinstance(pipeline, dict):
+            # e.g. an already validated Pipeline, or reported by the pipeline validation
+            return pipeline
+        defaults = defaults or {}
+        if "template" in pipeline:
+            template, reference = pipeline["template"], (*loc, "template")
+        else:
+            template, reference = defaults.get("template"), ("groups", group, "defaults", "template")
+        base = self.base(template, reference, group, defaults)
+        if base is None:
+            return None
+        fields = {to_hyphen_case(_k): _v for _k, _v in pipeline.items() if _k != "template"}
+        return self.merge(base, fields) if base else fields
+
+    def prepare_all(self, groups: Any) -> list[tuple[int, dict[str, Any], list[Any]]]:
+        """Validate all templates and group defaults up front, so their errors are collected
+        even if no pipeline uses them, and check the structure of the groups
+
+        Returns:
+            list[tuple[int, dict[str, Any], list[Any]]]: position, defaults and pipelines of the well-formed groups
+        """
+        for name in self.templates:
+            self.template(name, ("templates", name))
+
+        if not isinstance(groups, list):
+            self.errors.append({"type": "list_type", "loc": ("groups",), "input": groups})
+            return []
+        prepared_groups = []
+        for group, group_config in enumerate(groups):
+            if not isinstance(group_config, dict) or not isinstance(group_config.get("pipelines", []), list):
+                self.errors.append(
+                    _value_error(("groups", group), group_config, "Must be a mapping with a 'pipelines' list")
+                )
+                continue
+            defaults = group_config.get("defaults") or {}
+            if not isinstance(defaults, dict):
+                self.errors.append({"type": "dict_type", "loc": ("groups", group, "defaults"), "input": defaults})
+                continue
+            self.defaults(group, defaults)
+            prepared_groups.append((group, defaults, group_config.get("pipelines", [])))
+        return prepared_groups
+
+    def iter_pipelines(
+        self, pipelines: list[Any], groups: list[tuple[int, dict[str, Any], list[Any]]]
+    ) -> Iterator[Any]:
+        """Expand the top-level pipelines, followed by the pipelines of all groups, one by one while pydantic
+        validates them. The location of each yielded pipeline is appended to 'sources'.
+        """
+        for position, pipeline in enumerate(pipelines):
+            if (pipeline := self.expand(pipeline, ("pipelines", position))) is not None:
+                self.sources.append(("pipelines", position))
+                yield pipeline
+        for group, defaults, group_pipelines in groups:
+            for position, pipeline in enumerate(group_pipelines):
+                loc = ("groups", group, "pipelines", position)
+                if (pipeline := self.expand(pipeline, loc, group, defaults)) is not None:
+                    self.sources.append(loc)
+                    yield pipeline
+
+
+def _expand_templates(data: Any) -> tuple[Any, Optional[_PipelineTemplates]]:
+    """Expand 'templates' and 'groups' of the 'extpipes' section into its 'pipelines'. Templates and groups
+    are validated up front, the pipelines are expanded lazily by a generator, which pydantic validates item by item.
+
+    Returns:
+        tuple[Any, Optional[_PipelineTemplates]]: the expanded section, and the expander with the errors of
+            templates and groups and the location of each expanded pipeline (None if nothing gets expanded)
+    """
+    if not isinstance(data, dict) or not ({"templates", "groups"} & data.keys()):
+        return data, None
+    pipelines = data.get("pipelines") or []
+    if not isinstance(pipelines, list):
+        # reported by the field validation
+        return data, None
+
+    templates = data.get("templates") or {}
+    expander = _PipelineTemplates(templates if isinstance(templates, dict) else {})
+    if not isinstance(templates, dict):
+        expander.errors.append({"type": "dict_type", "loc": ("templates",), "input": templates})
+
+    expanded = {_k: _v for _k, _v in data.items() if _k not in ("templates", "groups")}
+    expanded["pipelines"] = expander.iter_pipelines(pipelines, expander.prepare_all(data.get("groups") or []))
+    return expanded, expander
+
+
+def _relocate(errors: list[Any], sources: Optional[list[Loc]]) -> list[InitErrorDetails]:
+    """Errors of expanded pipelines, located where the pipelines are configured"""
+    relocated: list[InitErrorDetails] = []
+    for error in errors:
+        loc = error["loc"]
+        if sources is not None and len(loc) > 1 and loc[0] == "pipelines" and isinstance(loc[1], int):
+            loc = (*sources[loc[1]], *loc[2:])
+        relocated.append(_init_error({**error, "loc": loc}))
+    return relocated
+
 
 class ExtpipesConfig(Model):
     """
     Configuration parameters for CDF Project Bootstrap, create mode
+
+    Optional 'templates' (named, partial pipelines) and 'groups' (pipelines with shared defaults)
+    are expanded into 'pipelines', group pipelines are appended after the top-level pipelines.
     """
 
     # here goes the main configuration
@@ -95,17 +389,35 @@ class ExtpipesConfig(Model):
 
     pipelines: list[Pipeline]
 
+    @model_validator(mode="wrap")
+    @classmethod
+    def expand_templates(cls, data: Any, handler: ModelWrapValidatorHandler["ExtpipesConfig"]) -> "ExtpipesConfig":
+        expanded, expander = _expand_templates(data)
+        if expander is None:
+            return handler(data)
+
+        config, errors = None, []
+        try:
+            config = handler(expanded)
+        except ValidationError as e:
+            # the generator is consumed, all 'sources' are known
+            errors = _relocate(e.errors(), expander.sources)
+        # unknown templates are only found while expanding
+        if errors := [*expander.errors, *errors]:
+            raise ValidationError.from_exception_data(cls.__name__, errors)
+        return config  # type: ignore
+
     @model_validator(mode="after")
     def check_pattern_condition(self) -> "ExtpipesConfig":
         if self.features.naming_pattern:
             misconfigured = [_pipeline.external_id for _pipeline in self.pipelines if _pipeline.external_id]
             if misconfigured:
-                logging.error(f"## Misconfigured pipelines external_id: {misconfigured}")
+                logging.error("## Misconfigured pipelines external_id: %s", lazy(lambda: misconfigured))
                 raise ValueError("With pattern provider, pipelines should not have external_id defined.")
 
             misconfigured = [_pipeline.name for _pipeline in self.pipelines if _pipeline.name]
             if misconfigured:
-                logging.error(f"## Misconfigured pipelines name: {misconfigured}")
+                logging.error("## Misconfigured pipelines name: %s", lazy(lambda: misconfigured))
                 raise ValueError("With pattern provider, pipelines should not have names defined.")
 
             def extract_jinja_variables(template: str) -> set[str]:
@@ -126,7 +438,38 @@ class ExtpipesConfig(Model):
 
             if len(misconfigured) > 0:
                 logging.info(f"## Required metadata properties: {required_fields}")
-                logging.error(f"## Misconfigured pipelines. Required metadata properties are required: {misconfigured}")
+                logging.error(
+                    "## Misconfigured pipelines. Required metadata properties are required: %s",
+                    lazy(lambda: misconfigured),
+                )
                 raise ValueError("With pattern provider, pipelines should have respective metadata fields configured.")
 
         return self
+
+    @model_validator(mode="after")
+    def check_unique_external_ids(self) -> "ExtpipesConfig":
+        if self.features.naming_pattern:
+            template = Environment().from_string(self.features.naming_pattern)
+            external_ids = [template.render(_pipeline.metadata) for _pipeline in self.pipelines]
+        else:
+            external_ids = [_pipeline.external_id for _pipeline in self.pipelines if _pipeline.external_id]
+
+        duplicates = [_xid for _xid, _count in Counter(external_ids).items() if _count > 1]
+        if duplicates:
+            logging.error("## Duplicate pipelines external_id: %s", lazy(lambda: duplicates))
+            raise ValueError("Pipelines external_id must be unique.")
+
+        return self
+
+
+def validate_extpipes_config(obj: dict) -> ExtpipesConfig:
+    """Validate the 'extpipes' section, with the cyclic GC paused
+
+    Args:
+        obj (dict): the 'extpipes' section of the config
+
+    Returns:
+        ExtpipesConfig: the validated config
+    """
+    with _gc_paused():
+        return ExtpipesConfig.model_validate(obj)
@@ -3,11 +3,34 @@ import os
 from pathlib import Path
 from typing import Optional, Type
 
+import yaml
 from dependency_injector import containers, providers
 from dotenv import load_dotenv
 
-from .app_config import CommandMode, ExtpipesConfig
+from .app_config import CommandMode, validate_extpipes_config
 from .common.cognite_client import CogniteConfig, get_cognite_client
+from .common.logging_utils import enable_queue_logging, lazy, stop_queue_logging
+
+# envvar expansion happens before parsing, which allows to use the much faster libyaml based loader (if available)
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def resolve_config_path(config_path: str | Path) -> Path:
+    """Path of the config file, as used to load it
+
+    Args:
+        config_path (str | Path): config path as given to the cli
+
+    Returns:
+        Path: the config path, inside the workspace if run from GitHub Actions
+    """
+    if os.getenv("GITHUB_ACTIONS") in ("true", True):
+        # if run from GITHUB_ACTIONS, the envvar is set to 'true' and the workspace-folder is mounted to
+        # -v "/home/runner/work/cdf-config-hub/cdf-config-hub":"/github/workspace"
+        # the buildpack image starts in the workspace-folder "/workspace",
+        # which requires to extend the path to load the config
+        return Path("/github/workspace") / config_path
+    return Path(config_path)
 
 
 def init_container(
@@ -29,16 +52,9 @@ def init_container(
     load_dotenv(dotenv_path, override=True)
 
     container = container_cls()
-    if os.getenv("GITHUB_ACTIONS") in ("true", True):
-        # if run from GITHUB_ACTIONS, the envvar is set to 'true' and the workspace-folder is mounted to
-        # -v "/home/runner/work/cdf-config-hub/cdf-config-hub":"/github/workspace"
-        # the buildpack image starts in the workspace-folder "/workspace",
-        # which requires to extend the path to load the config
-        container.config.from_yaml(Path("/github/workspace") / config_path, required=True)  # type: ignore
-    else:
-        container.config.from_yaml(config_path, required=True)  # type: ignore
+    container.config.from_yaml(resolve_config_path(config_path), required=True, loader=YAML_LOADER)  # type: ignore
 
-    logging.debug(f"{container.config()=}")
+    logging.debug("container.config()=%s", lazy(container.config))
     container.init_resources()  # i.e.logging
 
     return container
@@ -48,6 +64,19 @@ def init_logging(logging_config: Optional[dict], deprecated_logger_config: Optio
     # https://docs.python.org/3/howto/logging-cookbook.html#logging-to-a-single-file-from-multiple-processes
     # from logging-cookbook examples for 'logging_config' dict
     # TODO: needed to handle missing log folders?
+
+    # extpipes-cli options, which are not part of the 'dictConfig' schema
+    # queue: write logs from a background thread (default)
+    # json: use the JsonFormatter for all configured formatters
+    logging_config = dict(logging_config or {})
+    use_queue = logging_config.pop("queue", True)
+    use_json = logging_config.pop("json", False)
+    if use_json:
+        logging_config["formatters"] = {
+            _name: {"()": "extpipes.common.logging_utils.JsonFormatter"}
+            for _name in logging_config.get("formatters", {})
+        }
+
     if logging_config:
         logging.config.dictConfig(logging_config)
 
@@ -89,8 +118,13 @@ def init_logging(logging_config: Optional[dict], deprecated_logger_config: Optio
             ],
         )
 
+    if use_queue:
+        enable_queue_logging()
+
     yield logging.getLogger()
 
+    stop_queue_logging()
+
 
 def shutdown_container(container):
     logging.debug("function to handle additional shutdown of resources")
@@ -130,12 +164,26 @@ class DeployCommandContainer(CogniteContainer):
         CogniteContainer (_type_): _description_
     """
 
-    extpipes = providers.Resource(ExtpipesConfig.model_validate, obj=CogniteContainer.config.extpipes)
+    extpipes = providers.Resource(validate_extpipes_config, obj=CogniteContainer.config.extpipes)
+
+
+class QueryCommandContainer(CogniteContainer):
+    """Container providing 'cognite_client' and 'extpipes', the latter only validated on first use,
+    as 'query' skips loading the config if its index is cached (e.g. with '--live')
+
+    Args:
+        CogniteContainer (_type_): _description_
+    """
+
+    extpipes = providers.Singleton(validate_extpipes_config, obj=CogniteContainer.config.extpipes)
 
 
 ContainerSelector: dict[CommandMode, Type[containers.Container]] = {
     # CommandMode.PREPARE: DeployCommandContainer,
-    # CommandMode.DIAGRAM: DiagramCommandContainer,
+    CommandMode.DIAGRAM: DeployCommandContainer,
     CommandMode.DEPLOY: DeployCommandContainer,
+    CommandMode.DRIFT: DeployCommandContainer,
+    CommandMode.STATUS: DeployCommandContainer,
+    CommandMode.QUERY: QueryCommandContainer,
     # CommandMode.DELETE: DeleteCommandContainer,
 }
@@ -33,3 +33,27 @@ class ExtpipesValidationError(Exception):
     def __init__(self, message: str):
         self.message = message
         super().__init__(self.message)
+
+
+class ExtpipesLockError(Exception):
+    """Exception raised, if the deploy lock could not be acquired or got lost
+
+    Attributes:
+        message -- explanation of the error
+    """
+
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+class ExtpipesSupersededError(Exception):
+    """Exception raised, if a deploy got superseded by a newer revision, before or while applying changes
+
+    Attributes:
+        message -- explanation of what got deployed
+    """
+
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
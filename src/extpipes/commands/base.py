@@ -1,15 +1,67 @@
+import json
 import logging
-import pprint
+from functools import cached_property
 from pathlib import Path
 from typing import Self
 
 from cognite.client import CogniteClient
-from cognite.client.exceptions import CogniteNotFoundError
+from cognite.client.data_classes import (
+    ExtractionPipeline,
+    ExtractionPipelineContact,
+    ExtractionPipelineList,
+)
+from jinja2 import Template
 
 from .. import __version__
-from ..app_config import CommandMode, ExtpipesConfig
+from ..app_config import CommandMode, Contact, ExtpipesConfig, Pipeline
 from ..app_container import ContainerSelector, init_container
 from ..app_exceptions import ExtpipesConfigError
+from ..common.http_recording import install_transport
+from ..common.logging_utils import lazy
+
+# fields managed by this cli, used to detect changes between configuration and CDF
+# 'created_by' is left out, as it only documents the origin of a pipeline
+COMPARED_FIELDS = ["name", "description", "dataSetId", "rawTables", "schedule", "contacts", "metadata"]
+
+# metadata keys generated on each validation (e.g. a timestamp), which must not count as a change
+GENERATED_METADATA_PREFIX = "Dataops_"
+
+
+def render_template(template: str, metadata: dict[str, str]) -> str:
+    # Create a new Jinja2 template from the given template string
+    jinja_template = Template(template)
+
+    # Render the template using the provided metadata
+    rendered_string = jinja_template.render(metadata)
+    return rendered_string
+
+
+def comparable_fields(extpipe: ExtractionPipeline) -> dict:
+    """Normalized view of the cli-managed fields of an extraction pipeline,
+    independent of it being rendered from config or loaded from CDF
+
+    Args:
+        extpipe (ExtractionPipeline): requested or existing extraction pipeline
+
+    Returns:
+        dict: field-name to normalized value
+    """
+    dumped = extpipe.dump(camel_case=True)
+    fields = {}
+    for field in COMPARED_FIELDS:
+        value = dumped.get(field)
+        if field == "metadata":
+            value = {k: v for k, v in (value or {}).items() if not k.startswith(GENERATED_METADATA_PREFIX)}
+        elif field in ("rawTables", "contacts"):
+            # order of list items is not significant
+            value = sorted((value or []), key=lambda _v: json.dumps(_v, sort_keys=True))
+        fields[field] = value
+    return fields
+
+
+def changed_fields(requested: ExtractionPipeline, existing: ExtractionPipeline) -> list[str]:
+    requested_fields, existing_fields = comparable_fields(requested), comparable_fields(existing)
+    return [field for field in COMPARED_FIELDS if requested_fields[field] != existing_fields[field]]
 
 
 class CommandBase:
@@ -20,6 +72,9 @@ class CommandBase:
         debug: bool,
         dry_run: bool,
         dotenv_path: str | Path | None = None,
+        record_path: str | Path | None = None,
+        replay_path: str | Path | None = None,
+        replay_latency_scale: float = 1.0,
     ):
         # validate and load config according to command-mode
         ContainerCls = ContainerSelector[command]
@@ -28,16 +83,17 @@ class CommandBase:
         # logging is now configured
         logging.info(f"Starting CDF Extraction Pipelines version <v{__version__}> for command: <{command}>")
 
-        # Pull the config out of the container
-        self.extpipes_config: ExtpipesConfig = self.container.extpipes()
-        logging.debug(f"Features from config.yaml or defaults:\n {self.extpipes_config.features}")
-
-        self.naming_pattern = self.extpipes_config.features.naming_pattern
-        self.default_contacts = self.extpipes_config.features.default_contacts
-
         self.client: CogniteClient = self.container.cognite_client()
+        # optional offline replay, or recording of all CDF API requests
+        self.transport = install_transport(
+            self.client,
+            record_path=Path(record_path) if record_path else None,
+            replay_path=Path(replay_path) if replay_path else None,
+            latency_scale=replay_latency_scale,
+        )
         self.cdf_project = self.client.config.project
-        self.data_sets_in_scope = {}  # will be filled in within `validate`
+        # data set external-id to id, will be filled in within `resolve_data_sets`
+        self.data_set_ids: dict[str, int] = {}
 
         logging.info(f"Successful connection to CDF client to project: '{self.cdf_project}'")
 
@@ -45,6 +101,23 @@ class CommandBase:
         if self.dry_run:
             logging.warning("Starting Dry Run!")
 
+    @cached_property
+    def extpipes_config(self) -> ExtpipesConfig:
+        """The 'extpipes' config pulled out of the container. Validated on container init,
+        or on first use for containers providing it lazily (e.g. 'query' w/ a cached index)
+        """
+        extpipes_config: ExtpipesConfig = self.container.extpipes()
+        logging.debug("Features from config.yaml or defaults:\n %s", extpipes_config.features)
+        return extpipes_config
+
+    @cached_property
+    def naming_pattern(self) -> str:
+        return self.extpipes_config.features.naming_pattern
+
+    @cached_property
+    def default_contacts(self) -> list[Contact]:
+        return self.extpipes_config.features.default_contacts
+
     def validate_config(self) -> Self:
         """
         Validates the structure of the config file
@@ -53,28 +126,111 @@ class CommandBase:
           * Creates RAW Tables if they don't exist
         """
         # Data Sets
-        requested_data_set_external_ids = list(
-            {pipeline.data_set_external_id for pipeline in self.extpipes_config.pipelines}
-        )
-        logging.debug(f"{requested_data_set_external_ids=}")
-
-        try:
-            # will throw exception if one or more of the data sets don't exist
-            self.data_sets_in_scope = {
-                _d.external_id: _d
-                for _d in self.client.data_sets.retrieve_multiple(external_ids=requested_data_set_external_ids)
-            }
-        except CogniteNotFoundError as e:
-            if e.not_found:
-                msg = f"Missing Data Sets: {e.not_found}"
-            else:
-                msg = str(e)
-            logging.error(msg)
-            raise ExtpipesConfigError(msg)
+        self.resolve_data_sets()
 
         # return self for chaining
         return self
 
+    def resolve_data_sets(self) -> dict[str, int]:
+        """Look up the ids of all data sets configured by external-id, once per command.
+        Data sets configured by 'data-set-id' are not looked up.
+
+        The SDK splits the lookup into requests of max 1000 external-ids, sent concurrently (see 'http.max-workers').
+        Unknown external-ids are ignored by CDF, so all missing data sets are reported at once.
+
+        Returns:
+            dict[str, int]: data set external-id to id, also available as `self.data_set_ids`
+        """
+        requested = {_p.data_set_external_id for _p in self.extpipes_config.pipelines if _p.data_set_external_id}
+        if unresolved := list(requested - self.data_set_ids.keys()):
+            logging.debug("requested_data_set_external_ids: %s", lazy(lambda: unresolved))
+            self.data_set_ids.update(
+                {
+                    _d.external_id: _d.id  # type: ignore
+                    for _d in self.client.data_sets.retrieve_multiple(external_ids=unresolved, ignore_unknown_ids=True)
+                }
+            )
+
+        if missing := sorted(requested - self.data_set_ids.keys()):
+            msg = f"Missing Data Sets: {missing}"
+            logging.error(msg)
+            raise ExtpipesConfigError(msg)
+        return self.data_set_ids
+
+    def data_set_id(self, pipeline: Pipeline) -> int:
+        """Id of the pipeline's data set, configured or resolved by `resolve_data_sets`"""
+        if pipeline.data_set_id is not None:
+            return pipeline.data_set_id
+        return self.data_set_ids[pipeline.data_set_external_id]  # type: ignore
+
+    def pipeline_external_id(self, pipeline: Pipeline) -> str:
+        return pipeline.external_id if pipeline.external_id else render_template(self.naming_pattern, pipeline.metadata)
+
+    def render_extpipe(self, pipeline: Pipeline) -> ExtractionPipeline:
+        return ExtractionPipeline(  # key  # value
+            external_id=self.pipeline_external_id(pipeline),
+            name=pipeline.name if pipeline.name else render_template(self.naming_pattern, pipeline.metadata),
+            description=pipeline.description,
+            data_set_id=self.data_set_id(pipeline),
+            raw_tables=[{"dbName": _t.db_name, "tableName": _t.table_name} for _t in pipeline.raw_tables],
+            schedule=pipeline.schedule,
+            contacts=[
+                ExtractionPipelineContact(
+                    name=_c.name, email=_c.email, role=_c.role, send_notification=_c.send_notification
+                )
+                for _c in [*pipeline.contacts, *self.default_contacts]
+            ],
+            metadata=pipeline.metadata,
+            created_by=pipeline.created_by,
+        )
+
+    def get_requested_extpipes(self) -> ExtractionPipelineList:
+        return ExtractionPipelineList([self.render_extpipe(pipeline) for pipeline in self.extpipes_config.pipelines])
+
+    def get_existing_extpipes(self, requested_external_ids: list[str]) -> ExtractionPipelineList:
+        """Existing extpipes from CDF. Listing all extpipes of the project is only required
+        to find the ones to delete, otherwise the lookup is scoped to the requested ones.
+        """
+        if self.extpipes_config.features.automatic_delete:
+            return self.client.extraction_pipelines.list(limit=-1)
+
+        return self.client.extraction_pipelines.retrieve_multiple(
+            external_ids=requested_external_ids, ignore_unknown_ids=True
+        )
+
+    def plan(
+        self, requested_extpipes: ExtractionPipelineList, existing_extpipes: ExtractionPipelineList
+    ) -> tuple[ExtractionPipelineList, ExtractionPipelineList, list[str]]:
+        """Build the 3 lists create/update/delete, as
+        Cognite SDK v6.30.1 does NOT support UPSERT (with ExtractionPipelines)
+
+        Returns:
+            tuple[ExtractionPipelineList, ExtractionPipelineList, list[str]]: extpipes to create and update,
+                and external-ids to delete (only if 'automatic-delete' is enabled)
+        """
+        existing_external_ids = set(existing_extpipes.as_external_ids())
+        requested_external_ids = set(requested_extpipes.as_external_ids())
+
+        create_extpipes = ExtractionPipelineList(
+            [extpipe for extpipe in requested_extpipes if extpipe.external_id not in existing_external_ids]
+        )
+
+        update_extpipes = ExtractionPipelineList(
+            [extpipe for extpipe in requested_extpipes if extpipe.external_id in existing_external_ids]
+        )
+
+        delete_extpipes = (
+            [
+                external_id
+                for external_id in existing_extpipes.as_external_ids()
+                if external_id not in requested_external_ids
+            ]
+            if self.extpipes_config.features.automatic_delete
+            else []
+        )
+
+        return create_extpipes, update_extpipes, delete_extpipes
+
     def ensure_raw_tables(self):
         # RAW
         def find_missing(existing: dict, target: dict) -> dict:
@@ -107,6 +263,6 @@ class CommandBase:
 
         missing = find_missing(cdf_dbs, requested_raw_tables)
         if missing:
-            logging.warning(f"## Detected missing RAW tables: {pprint.pformat(missing)}")
+            logging.warning("## Detected missing RAW tables: %s", lazy(lambda: missing))
             for _db, _tables in missing.items():
                 self.client.raw.tables.create(db_name=_db, name=_tables)
@@ -1,94 +1,221 @@
+import hashlib
+import json
 import logging
-
-from cognite.client.data_classes import (
-    ExtractionPipeline,
-    ExtractionPipelineContact,
-    ExtractionPipelineList,
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TypeVar
+
+from cognite.client.data_classes import ExtractionPipeline, ExtractionPipelineList
+
+from ..app_config import DeployLockBackend
+from ..app_exceptions import ExtpipesSupersededError
+from ..common.deploy_lock import (
+    DeployLock,
+    FileLockBackend,
+    LockBackend,
+    RawLockBackend,
 )
-from jinja2 import Template
+from ..common.logging_utils import lazy
+from .base import CommandBase, comparable_fields
+
+T = TypeVar("T")
+
+
+def _fingerprint(extpipe: ExtractionPipeline) -> bytes:
+    """Compact digest of the cli-managed fields, to detect changes w/o keeping the extpipe itself"""
+    return hashlib.blake2b(json.dumps(comparable_fields(extpipe), sort_keys=True).encode(), digest_size=16).digest()
+
 
-from .base import CommandBase
+def _chunked(iterable: Iterable[T], chunk_size: int) -> Iterator[list[T]]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
 
 
-def _render_template(template: str, metadata: dict[str, str]) -> str:
-    # Create a new Jinja2 template from the given template string
-    jinja_template = Template(template)
+class PipelineRecord:
+    """Compact record of an existing extpipe, keeping only what is needed to plan a deployment"""
 
-    # Render the template using the provided metadata
-    rendered_string = jinja_template.render(metadata)
-    return rendered_string
+    __slots__ = ("external_id", "fingerprint")
+
+    def __init__(self, external_id: str, fingerprint: bytes):
+        self.external_id = external_id
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def from_extpipe(cls, extpipe: ExtractionPipeline) -> "PipelineRecord":
+        return cls(extpipe.external_id, _fingerprint(extpipe))  # type: ignore
 
 
 class CommandDeploy(CommandBase):
-    def command(self) -> None:
-        # get existing extpipes
-        existing_extpipes = self.client.extraction_pipelines.list(limit=-1)
+    # set while a deploy lock is held
+    lock: Optional[DeployLock] = None
+
+    @contextmanager
+    def deploy_lock(self, revision: Optional[int] = None) -> Iterator[None]:
+        """Hold the deploy lock of the CDF project, if configured with 'features.deploy-lock'.
+        Dry runs don't write, and don't take the lock.
+
+        Args:
+            revision (int, optional): revision of the config, newer revisions supersede waiting and running deploys.
+                W/o a revision, the run only waits for the lock.
+
+        Raises:
+            ExtpipesSupersededError: if superseded by a newer revision, which makes this run obsolete
+        """
+        lock_config = self.extpipes_config.features.deploy_lock
+        if lock_config is None or self.dry_run:
+            yield
+            return
 
-        logging.debug(f"{existing_extpipes.as_external_ids()=}")
+        backend: LockBackend
+        match lock_config.backend:
+            case DeployLockBackend.FILE:
+                backend = FileLockBackend(Path(lock_config.path))
+            case _:
+                backend = RawLockBackend(self.client, lock_config.raw_db, lock_config.raw_table)
+
+        lock = DeployLock(
+            backend,
+            key=self.cdf_project,
+            revision=revision,
+            lease_seconds=lock_config.lease_seconds,
+            wait_seconds=lock_config.wait_seconds,
+            poll_seconds=lock_config.poll_seconds,
+        )
+        if not lock.acquire():
+            raise ExtpipesSupersededError("Superseded by a newer revision, nothing deployed")
+
+        self.lock = lock
+        try:
+            yield
+        finally:
+            self.lock = None
+            lock.release()
+
+    def check_superseded(self, applied: bool = False) -> None:
+        """Checked before writing to CDF, to leave the writes to the run of a newer revision
+
+        Args:
+            applied (bool, optional): if changes got applied already, e.g. previous chunks. Defaults to False.
+
+        Raises:
+            ExtpipesSupersededError: if a newer revision got queued
+        """
+        if self.lock and self.lock.is_superseded():
+            logging.warning("A newer revision got queued, leaving the deployment to its run")
+            raise ExtpipesSupersededError(
+                "Superseded by a newer revision, "
+                + ("stopped before applying further changes" if applied else "nothing deployed")
+            )
+
+    def iter_existing_records(self, chunk_size: int) -> Iterator[PipelineRecord]:
+        """All existing extpipes as compact records, listed from CDF in chunks"""
+        # ExtractionPipelinesAPI has no public generator (like 'client.assets(chunk_size=..)') in SDK v6
+        for extpipes in self.client.extraction_pipelines._list_generator(
+            method="GET", list_cls=ExtractionPipelineList, resource_cls=ExtractionPipeline, chunk_size=chunk_size
+        ):
+            yield from (PipelineRecord.from_extpipe(_e) for _e in extpipes)  # type: ignore
+
+    def command_streaming(self, chunk_size: int = 1000) -> None:
+        """Deploy in bounded chunks: config -> rendered extpipe -> diff -> apply.
+
+        Existing extpipes are only kept as `PipelineRecord`s. They are listed up front if
+        'automatic-delete' is enabled, otherwise retrieved per chunk of requested extpipes.
+        Unchanged extpipes are not updated.
+        """
+        automatic_delete = self.extpipes_config.features.automatic_delete
+        existing_records: dict[str, PipelineRecord] = (
+            {_r.external_id: _r for _r in self.iter_existing_records(chunk_size)} if automatic_delete else {}
+        )
+        logging.debug(f"Existing extraction pipelines listed: {len(existing_records)}")
+
+        if not self.dry_run:
+            self.check_superseded()
+            logging.info("Applying configuration")
+            self.ensure_raw_tables()
+
+        totals = {"create": 0, "update": 0, "unchanged": 0, "delete": 0}
+        # if extpipes of previous chunks got written
+        applied = False
+        requested_extpipes = (self.render_extpipe(pipeline) for pipeline in self.extpipes_config.pipelines)
+        for chunk in _chunked(requested_extpipes, chunk_size):
+            if not automatic_delete:
+                existing_records = {
+                    _e.external_id: PipelineRecord.from_extpipe(_e)  # type: ignore
+                    for _e in self.client.extraction_pipelines.retrieve_multiple(
+                        external_ids=[_e.external_id for _e in chunk], ignore_unknown_ids=True  # type: ignore
+                    )
+                }
+
+            create_extpipes, update_extpipes = ExtractionPipelineList([]), ExtractionPipelineList([])
+            for extpipe in chunk:
+                # what remains in 'existing_records' after all chunks, is not configured
+                if (record := existing_records.pop(extpipe.external_id, None)) is None:  # type: ignore
+                    create_extpipes.append(extpipe)
+                elif record.fingerprint != _fingerprint(extpipe):
+                    update_extpipes.append(extpipe)
+                else:
+                    totals["unchanged"] += 1
+
+            totals["create"] += len(create_extpipes)
+            totals["update"] += len(update_extpipes)
+            logging.debug(f"Chunk planned: {len(create_extpipes)} to create, {len(update_extpipes)} to update")
+
+            if not self.dry_run:
+                if create_extpipes or update_extpipes:
+                    self.check_superseded(applied=applied)
+                    applied = True
+                if create_extpipes:
+                    self.client.extraction_pipelines.create(create_extpipes)
+                if update_extpipes:
+                    self.client.extraction_pipelines.update(update_extpipes)
+
+        if automatic_delete and existing_records:
+            totals["delete"] = len(existing_records)
+            if not self.dry_run:
+                self.check_superseded(applied=applied)
+                for external_ids in _chunked(existing_records, chunk_size):
+                    self.client.extraction_pipelines.delete(external_id=external_ids)
+
+        logging.info(
+            f"Extraction Pipelines {'planned' if self.dry_run else 'applied'}: "
+            + ", ".join(f"{_count} {_action}" for _action, _count in totals.items())
+        )
+        if self.dry_run:
+            logging.warning("Dry run detected. No changes applied to CDF.")
 
+    def command(self) -> None:
         # get requested from config
-        requested_extpipes = ExtractionPipelineList(
-            [
-                ExtractionPipeline(  # key  # value
-                    external_id=pipeline.external_id
-                    if pipeline.external_id
-                    else _render_template(self.naming_pattern, pipeline.metadata),
-                    name=pipeline.name if pipeline.name else _render_template(self.naming_pattern, pipeline.metadata),
-                    description=pipeline.description,
-                    data_set_id=self.data_sets_in_scope.get(pipeline.data_set_external_id).id,  # type: ignore
-                    raw_tables=[{"dbName": _t.db_name, "tableName": _t.table_name} for _t in pipeline.raw_tables],
-                    schedule=pipeline.schedule,
-                    contacts=[
-                        ExtractionPipelineContact(
-                            name=_c.name, email=_c.email, role=_c.role, send_notification=_c.send_notification
-                        )
-                        for _c in [*pipeline.contacts, *self.default_contacts]
-                    ],
-                    metadata=pipeline.metadata,
-                    created_by=pipeline.created_by,
-                )
-                for pipeline in self.extpipes_config.pipelines
-            ]
-        )
+        requested_extpipes = self.get_requested_extpipes()
 
-        logging.debug(f"{requested_extpipes.as_external_ids()=}")
+        logging.debug("requested_extpipes: %s", lazy(requested_extpipes.as_external_ids))
 
-        # Cognite SDK v6.30.1 does NOT support UPSERT (with ExtractionPipelines)
-        # build 3 lists create/update/delete
-        create_extpipes = ExtractionPipelineList(
-            [
-                extpipe
-                for extpipe in requested_extpipes
-                if extpipe.external_id not in existing_extpipes.as_external_ids()
-            ]
-        )
+        # get existing extpipes
+        existing_extpipes = self.get_existing_extpipes(requested_extpipes.as_external_ids())
 
-        update_extpipes = ExtractionPipelineList(
-            [extpipe for extpipe in requested_extpipes if extpipe.external_id in existing_extpipes.as_external_ids()]
-        )
+        logging.debug("existing_extpipes: %s", lazy(existing_extpipes.as_external_ids))
 
-        delete_extpipes = [
-            external_id
-            for external_id in existing_extpipes.as_external_ids()
-            if external_id not in requested_extpipes.as_external_ids()
-        ]
+        create_extpipes, update_extpipes, delete_extpipes = self.plan(requested_extpipes, existing_extpipes)
 
         if create_extpipes:
-            logging.info(f"Extraction pipelines to create:  {create_extpipes.as_external_ids()}")
+            logging.info("Extraction pipelines to create:  %s", lazy(create_extpipes.as_external_ids))
         if update_extpipes:
-            logging.info(f"Extraction pipelines to update:  {update_extpipes.as_external_ids()}")
-        if self.extpipes_config.features.automatic_delete and delete_extpipes:
-            logging.info(f"Extraction pipelines to delete:  {delete_extpipes}")
+            logging.info("Extraction pipelines to update:  %s", lazy(update_extpipes.as_external_ids))
+        if delete_extpipes:
+            logging.info("Extraction pipelines to delete:  %s", lazy(lambda: delete_extpipes))
 
         if self.dry_run:
             logging.warning("Dry run detected. No changes to be applied to CDF.")
             return
 
+        self.check_superseded()
+
         logging.info("Applying configuration")
 
         self.ensure_raw_tables()
 
-        if self.extpipes_config.features.automatic_delete and delete_extpipes:
+        if delete_extpipes:
             self.client.extraction_pipelines.delete(external_id=delete_extpipes)
             logging.info(f"Extraction Pipelines deleted: {len(delete_extpipes)}")
 
@@ -0,0 +1,211 @@
+import logging
+from collections import defaultdict
+from enum import ReprEnum
+from fnmatch import fnmatchcase
+from typing import Iterable, Iterator, Optional
+
+from ..app_config import Pipeline
+from .base import CommandBase
+from .status import RunStatus, latest_run
+
+
+class DiagramFormat(str, ReprEnum):
+    MERMAID = "mermaid"
+    DOT = "dot"
+
+
+class NodeKind(str, ReprEnum):
+    DATA_SET = "dataset"
+    PIPELINE = "pipeline"
+    RAW_DB = "rawdb"
+    RAW_TABLE = "rawtable"
+    CONTACT = "contact"
+
+
+class EdgeKind(str, ReprEnum):
+    # data set -> pipeline -> raw table
+    FLOW = "flow"
+    # raw table -> raw db, pipeline -> contact
+    RELATION = "relation"
+
+
+MERMAID_CLASSES = {
+    NodeKind.DATA_SET: "fill:#e8f0fe,stroke:#1a73e8",
+    NodeKind.PIPELINE: "fill:#fff,stroke:#333",
+    NodeKind.RAW_DB: "fill:#fef7e0,stroke:#f9ab00",
+    NodeKind.RAW_TABLE: "fill:#fef7e0,stroke:#f9ab00",
+    NodeKind.CONTACT: "fill:#f1f3f4,stroke:#5f6368",
+    # live state of pipelines
+    RunStatus.SUCCESS: "fill:#e6f4ea,stroke:#1e8e3e",
+    RunStatus.FAILURE: "fill:#fce8e6,stroke:#d93025",
+    RunStatus.SEEN: "fill:#e6f4ea,stroke:#1e8e3e",
+    RunStatus.NEVER: "fill:#fff,stroke:#333,stroke-dasharray:4",
+    RunStatus.MISSING: "fill:#fff,stroke:#d93025,stroke-dasharray:4",
+}
+
+DOT_SHAPES = {
+    NodeKind.DATA_SET: "folder",
+    NodeKind.PIPELINE: "box",
+    NodeKind.RAW_DB: "cylinder",
+    NodeKind.RAW_TABLE: "tab",
+    NodeKind.CONTACT: "ellipse",
+}
+
+DOT_COLORS = {
+    RunStatus.SUCCESS: "darkgreen",
+    RunStatus.FAILURE: "red",
+    RunStatus.SEEN: "darkgreen",
+    RunStatus.NEVER: "gray",
+    RunStatus.MISSING: "red",
+}
+
+
+class _MermaidWriter:
+    def header(self) -> str:
+        return "graph LR\n"
+
+    def node(self, node_id: str, kind: NodeKind, label: str, state: Optional[RunStatus]) -> str:
+        # mermaid entity codes, '<email>' of contacts would be parsed as html otherwise
+        label = label.replace("#", "#35;").replace('"', "#quot;").replace("<", "#lt;").replace(">", "#gt;")
+        return f'  {node_id}["{label}"]:::{(state or kind).value}\n'
+
+    def edge(self, source_id: str, target_id: str, kind: EdgeKind) -> str:
+        return f"  {source_id} {'-->' if kind == EdgeKind.FLOW else '-.-'} {target_id}\n"
+
+    def footer(self) -> str:
+        return "".join(f"  classDef {_class.value} {_style}\n" for _class, _style in MERMAID_CLASSES.items())
+
+
+class _DotWriter:
+    def header(self) -> str:
+        return "digraph extpipes {\n  rankdir=LR;\n"
+
+    def node(self, node_id: str, kind: NodeKind, label: str, state: Optional[RunStatus]) -> str:
+        label = label.replace("\\", "\\\\").replace('"', '\\"')
+        color = f", color={DOT_COLORS[state]}" if state else ""
+        return f'  {node_id} [label="{label}", shape={DOT_SHAPES[kind]}{color}];\n'
+
+    def edge(self, source_id: str, target_id: str, kind: EdgeKind) -> str:
+        style = "" if kind == EdgeKind.FLOW else " [style=dotted, arrowhead=none]"
+        return f"  {source_id} -> {target_id}{style};\n"
+
+    def footer(self) -> str:
+        return "}\n"
+
+
+class CommandDiagram(CommandBase):
+    def build_indexes(self) -> dict[NodeKind, dict[str, list[int]]]:
+        """Index the positions of all configured pipelines by data set, RAW db and contact email
+        with a single pass, to select subgraphs without scanning all pipelines per filter.
+        """
+        indexes: dict[NodeKind, dict[str, list[int]]] = {
+            NodeKind.DATA_SET: defaultdict(list),
+            NodeKind.RAW_DB: defaultdict(list),
+            NodeKind.CONTACT: defaultdict(list),
+        }
+        for position, pipeline in enumerate(self.extpipes_config.pipelines):
+            indexes[NodeKind.DATA_SET][pipeline.data_set_key].append(position)
+            for raw_db in {_t.db_name for _t in pipeline.raw_tables}:
+                indexes[NodeKind.RAW_DB][raw_db].append(position)
+            for email in {_c.email for _c in [*pipeline.contacts, *self.default_contacts]}:
+                indexes[NodeKind.CONTACT][email].append(position)
+        return indexes
+
+    def select_pipelines(
+        self,
+        data_sets: Iterable[str] = (),
+        raw_dbs: Iterable[str] = (),
+        contacts: Iterable[str] = (),
+        external_id_patterns: Iterable[str] = (),
+    ) -> list[int]:
+        """Positions of the pipelines to include. Values of the same filter are combined with 'or',
+        different filters with 'and'. Without any filter, all pipelines are selected.
+        """
+        indexes = self.build_indexes()
+        selected: Optional[set[int]] = None
+        for kind, values in ((NodeKind.DATA_SET, data_sets), (NodeKind.RAW_DB, raw_dbs), (NodeKind.CONTACT, contacts)):
+            if values := list(values):
+                matches = {_p for _value in values for _p in indexes[kind].get(_value, [])}
+                selected = matches if selected is None else selected & matches
+
+        positions = range(len(self.extpipes_config.pipelines)) if selected is None else sorted(selected)
+        if patterns := list(external_id_patterns):
+            pipelines = self.extpipes_config.pipelines
+            positions = [
+                _p
+                for _p in positions
+                if any(fnmatchcase(self.pipeline_external_id(pipelines[_p]), _pattern) for _pattern in patterns)
+            ]
+        return list(positions)
+
+    def get_live_states(self, external_ids: list[str]) -> dict[str, RunStatus]:
+        existing_extpipes = {
+            _e.external_id: _e
+            for _e in self.client.extraction_pipelines.retrieve_multiple(
+                external_ids=external_ids, ignore_unknown_ids=True
+            )
+        }
+        return {_xid: latest_run(existing_extpipes.get(_xid))[0] for _xid in external_ids}
+
+    def command(
+        self,
+        format: DiagramFormat = DiagramFormat.MERMAID,
+        data_sets: Iterable[str] = (),
+        raw_dbs: Iterable[str] = (),
+        contacts: Iterable[str] = (),
+        external_id_patterns: Iterable[str] = (),
+        with_contacts: bool = True,
+        live: bool = False,
+    ) -> Iterator[str]:
+        """Generate the diagram of data set -> pipeline -> RAW table (-> RAW db) and pipeline -> contacts
+        as a stream of lines. Each node and edge is written once, when it is first reached.
+
+        Returns:
+            Iterator[str]: Mermaid or DOT lines
+        """
+        pipelines: list[Pipeline] = self.extpipes_config.pipelines
+        positions = self.select_pipelines(data_sets, raw_dbs, contacts, external_id_patterns)
+        external_ids = {_p: self.pipeline_external_id(pipelines[_p]) for _p in positions}
+        logging.info(f"Diagram of {len(positions)} of {len(pipelines)} configured extraction pipelines")
+
+        live_states = self.get_live_states(list(external_ids.values())) if live else {}
+
+        writer = _MermaidWriter() if format == DiagramFormat.MERMAID else _DotWriter()
+        node_ids: dict[tuple[NodeKind, str], str] = {}
+        edges: set[tuple[str, str]] = set()
+
+        def node(kind: NodeKind, key: str, label: str, state: Optional[RunStatus] = None) -> Iterator[str]:
+            if (kind, key) not in node_ids:
+                node_ids[(kind, key)] = f"n{len(node_ids)}"
+                yield writer.node(node_ids[(kind, key)], kind, label, state)
+
+        def edge(source: tuple[NodeKind, str], target: tuple[NodeKind, str], kind: EdgeKind) -> Iterator[str]:
+            source_id, target_id = node_ids[source], node_ids[target]
+            if (source_id, target_id) not in edges:
+                edges.add((source_id, target_id))
+                yield writer.edge(source_id, target_id, kind)
+
+        yield writer.header()
+        for position in positions:
+            pipeline, external_id = pipelines[position], external_ids[position]
+            pipeline_key = (NodeKind.PIPELINE, external_id)
+            data_set_key = (NodeKind.DATA_SET, pipeline.data_set_key)
+
+            yield from node(*data_set_key, pipeline.data_set_key)
+            yield from node(*pipeline_key, external_id, live_states.get(external_id))
+            yield from edge(data_set_key, pipeline_key, EdgeKind.FLOW)
+
+            for raw_table in pipeline.raw_tables:
+                raw_db_key = (NodeKind.RAW_DB, raw_table.db_name)
+                raw_table_key = (NodeKind.RAW_TABLE, f"{raw_table.db_name}/{raw_table.table_name}")
+                yield from node(*raw_db_key, raw_table.db_name)
+                yield from node(*raw_table_key, raw_table.table_name)
+                yield from edge(pipeline_key, raw_table_key, EdgeKind.FLOW)
+                yield from edge(raw_table_key, raw_db_key, EdgeKind.RELATION)
+
+            if with_contacts:
+                for contact in [*pipeline.contacts, *self.default_contacts]:
+                    contact_key = (NodeKind.CONTACT, contact.email)
+                    yield from node(*contact_key, f"{contact.name} <{contact.email}>")
+                    yield from edge(pipeline_key, contact_key, EdgeKind.RELATION)
+        yield writer.footer()
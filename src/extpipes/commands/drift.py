@@ -0,0 +1,88 @@
+import json
+import logging
+import xml.etree.ElementTree as ET
+from enum import ReprEnum
+from typing import Any
+
+from .base import CommandBase, changed_fields
+
+
+class DriftFormat(str, ReprEnum):
+    JSON = "json"
+    JUNIT = "junit"
+
+
+class DriftStatus(str, ReprEnum):
+    # configured, but not existing in CDF
+    MISSING = "missing"
+    # configured and existing in CDF, with different field values
+    CHANGED = "changed"
+    # existing in CDF, but not configured (only reported with 'automatic-delete' enabled)
+    UNMANAGED = "unmanaged"
+
+
+def _as_json(report: dict[str, Any]) -> str:
+    # compact, as it is meant to be consumed by alerting jobs
+    return json.dumps(report, separators=(",", ":"))
+
+
+def _as_junit(report: dict[str, Any]) -> str:
+    drifted = {_d["external_id"]: _d for _d in report["drifted"]}
+    testsuite = ET.Element(
+        "testsuite",
+        name=f"extpipes-drift:{report['project']}",
+        tests=str(len(report["checked"])),
+        failures=str(len(drifted)),
+    )
+    for external_id in report["checked"]:
+        testcase = ET.SubElement(testsuite, "testcase", classname=report["project"], name=external_id)
+        if drift := drifted.get(external_id):
+            failure = ET.SubElement(testcase, "failure", type=drift["status"])
+            failure.text = ", ".join(drift["fields"]) if drift["fields"] else drift["status"]
+    return ET.tostring(testsuite, encoding="unicode")
+
+
+class CommandDrift(CommandBase):
+    def command(self) -> dict[str, Any]:
+        """Compare configuration with CDF, reusing the planning of 'deploy' w/o applying anything.
+        No RAW tables are created, and CDF is only listed for the configured extpipes,
+        unless 'automatic-delete' is enabled.
+
+        Returns:
+            dict[str, Any]: drift report with all checked external-ids and the drifted ones
+        """
+        requested_extpipes = self.get_requested_extpipes()
+        existing_extpipes = self.get_existing_extpipes(requested_extpipes.as_external_ids())
+
+        create_extpipes, update_extpipes, delete_extpipes = self.plan(requested_extpipes, existing_extpipes)
+
+        drifted: list[dict[str, Any]] = [
+            {"external_id": extpipe.external_id, "status": DriftStatus.MISSING, "fields": []}
+            for extpipe in create_extpipes
+        ]
+        for extpipe in update_extpipes:
+            if fields := changed_fields(extpipe, existing_extpipes.get(external_id=extpipe.external_id)):
+                drifted.append({"external_id": extpipe.external_id, "status": DriftStatus.CHANGED, "fields": fields})
+        drifted.extend(
+            {"external_id": external_id, "status": DriftStatus.UNMANAGED, "fields": []}
+            for external_id in delete_extpipes
+        )
+
+        if drifted:
+            logging.warning(f"Drift detected for {len(drifted)} extraction pipelines")
+        else:
+            logging.info("No drift detected")
+
+        return {
+            "project": self.cdf_project,
+            "checked": [*requested_extpipes.as_external_ids(), *delete_extpipes],
+            "drifted": drifted,
+        }
+
+    @staticmethod
+    def render(report: dict[str, Any], format: DriftFormat) -> str:
+        match format:
+            case DriftFormat.JUNIT:
+                return _as_junit(report)
+            case _:
+                return _as_json(report)
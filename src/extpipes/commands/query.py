@@ -0,0 +1,209 @@
+import logging
+from collections import defaultdict
+from enum import ReprEnum
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from cognite.client.data_classes import ExtractionPipelineList
+from dotenv import load_dotenv
+from rich.table import Table
+
+from ..app_container import resolve_config_path
+from ..common.config_cache import ConfigCache
+from ..common.reports import ReportFormat, render_report
+from .base import GENERATED_METADATA_PREFIX, CommandBase
+
+# bump, when the persisted index layout changes
+INDEX_VERSION = 1
+
+
+class IndexKind(str, ReprEnum):
+    DATA_SET = "data-set"
+    RAW_DB = "raw-db"
+    # as '<db>/<table>'
+    RAW_TABLE = "raw-table"
+    CONTACT = "contact"
+    # as '<key>' and '<key>=<value>'
+    METADATA = "metadata"
+    SCHEDULE = "schedule"
+
+
+class PipelineIndex:
+    """Secondary indexes of pipelines, as positions of their rows of 'external_id', 'data_set' and 'schedule'"""
+
+    def __init__(self):
+        self.rows: list[tuple[str, str, str]] = []
+        self.indexes: dict[IndexKind, dict[str, list[int]]] = {_kind: defaultdict(list) for _kind in IndexKind}
+
+    def add(
+        self,
+        external_id: str,
+        data_set: str,
+        schedule: str,
+        raw_tables: Iterable[tuple[str, str]],
+        contacts: Iterable[str],
+        metadata: dict[str, str],
+        data_set_id: Optional[int] = None,
+    ) -> None:
+        position = len(self.rows)
+        self.rows.append((external_id, data_set, schedule))
+        self.indexes[IndexKind.DATA_SET][data_set].append(position)
+        if data_set_id is not None and str(data_set_id) != data_set:
+            # data sets can be configured by id as well
+            self.indexes[IndexKind.DATA_SET][str(data_set_id)].append(position)
+        self.indexes[IndexKind.SCHEDULE][schedule].append(position)
+        raw_tables = set(raw_tables)
+        for raw_db in {_db for _db, _ in raw_tables}:
+            self.indexes[IndexKind.RAW_DB][raw_db].append(position)
+        for raw_db, raw_table in raw_tables:
+            self.indexes[IndexKind.RAW_TABLE][f"{raw_db}/{raw_table}"].append(position)
+        for email in set(contacts):
+            self.indexes[IndexKind.CONTACT][email].append(position)
+        for key, value in metadata.items():
+            # generated metadata differs with each run, and is not worth querying
+            if not key.startswith(GENERATED_METADATA_PREFIX):
+                self.indexes[IndexKind.METADATA][key].append(position)
+                self.indexes[IndexKind.METADATA][f"{key}={value}"].append(position)
+
+    def select(self, filters: dict[IndexKind, Iterable[str]]) -> list[tuple[str, str, str]]:
+        """Rows of the matching pipelines. Values of the same filter are combined with 'or',
+        different filters with 'and'. Without any filter, all pipelines are selected.
+        """
+        selected: Optional[set[int]] = None
+        for kind, values in filters.items():
+            if values := list(values):
+                matches = {_p for _value in values for _p in self.indexes[kind].get(_value, [])}
+                selected = matches if selected is None else selected & matches
+        positions = range(len(self.rows)) if selected is None else sorted(selected)
+        return [self.rows[_p] for _p in positions]
+
+    def dump(self) -> dict[str, Any]:
+        return {
+            "version": INDEX_VERSION,
+            "rows": self.rows,
+            "indexes": {_kind.value: _index for _kind, _index in self.indexes.items()},
+        }
+
+    @classmethod
+    def load(cls, dumped: Any) -> Optional["PipelineIndex"]:
+        if not isinstance(dumped, dict) or dumped.get("version") != INDEX_VERSION:
+            return None
+        index = cls()
+        index.rows = [tuple(_row) for _row in dumped["rows"]]  # type: ignore
+        index.indexes = {_kind: dumped["indexes"].get(_kind.value, {}) for _kind in IndexKind}
+        return index
+
+
+def cached_config_index(
+    config_path: str | Path, dotenv_path: str | Path | None = None
+) -> tuple[ConfigCache, Optional[PipelineIndex]]:
+    """Index of the config file from the cache, w/o loading and validating the config
+
+    Args:
+        config_path (str | Path): path of the config file
+        dotenv_path (str | Path, optional): .env file with values of environment variables used in the config
+
+    Returns:
+        tuple[ConfigCache, Optional[PipelineIndex]]: the cache, to save a new index to, and the cached index if any
+    """
+    # the values of environment variables are part of the cache key, as in 'init_container'
+    load_dotenv(dotenv_path, override=True)
+    cache = ConfigCache(resolve_config_path(config_path), kind="query-index")
+    return cache, PipelineIndex.load(cache.load())
+
+
+def _as_table(report: dict[str, Any]) -> Table:
+    table = Table(title=f"Extraction Pipelines matching: {report['query']}")
+    table.add_column("external-id")
+    table.add_column("data-set")
+    table.add_column("schedule")
+    table.add_column("in config")
+    if report["live"]:
+        table.add_column("in CDF")
+
+    for pipeline in report["pipelines"]:
+        row = [pipeline["external_id"], pipeline["data_set"], pipeline["schedule"], "yes" if pipeline["config"] else ""]
+        if report["live"]:
+            row.append("yes" if pipeline["cdf"] else "")
+        table.add_row(*row)
+    return table
+
+
+class CommandQuery(CommandBase):
+    def build_config_index(self) -> PipelineIndex:
+        index = PipelineIndex()
+        default_emails = [_c.email for _c in self.default_contacts]
+        for pipeline in self.extpipes_config.pipelines:
+            index.add(
+                external_id=self.pipeline_external_id(pipeline),
+                data_set=pipeline.data_set_key,
+                schedule=pipeline.schedule,
+                raw_tables=[(_t.db_name, _t.table_name) for _t in pipeline.raw_tables],
+                contacts=[*(_c.email for _c in pipeline.contacts), *default_emails],
+                metadata=pipeline.metadata,
+            )
+        return index
+
+    def build_live_index(self) -> PipelineIndex:
+        """Index of all extpipes listed from CDF, with their data set ids resolved to external-ids"""
+        extpipes: ExtractionPipelineList = self.client.extraction_pipelines.list(limit=-1)
+        # reuse data sets resolved already
+        data_sets = {_id: _xid for _xid, _id in self.data_set_ids.items()}
+        if unresolved := list({_e.data_set_id for _e in extpipes if _e.data_set_id} - data_sets.keys()):
+            data_sets.update(
+                {
+                    _d.id: _d.external_id or str(_d.id)  # type: ignore
+                    for _d in self.client.data_sets.retrieve_multiple(ids=unresolved, ignore_unknown_ids=True)
+                }
+            )
+        logging.debug(f"Listed {len(extpipes)} extraction pipelines from CDF")
+
+        index = PipelineIndex()
+        for extpipe in extpipes:
+            dumped = extpipe.dump(camel_case=True)
+            index.add(
+                external_id=extpipe.external_id,  # type: ignore
+                data_set=data_sets.get(extpipe.data_set_id, str(extpipe.data_set_id)),  # type: ignore
+                schedule=extpipe.schedule or "",
+                raw_tables=[(_t["dbName"], _t["tableName"]) for _t in dumped.get("rawTables", [])],
+                contacts=[_c["email"] for _c in dumped.get("contacts", []) if _c.get("email")],
+                metadata=extpipe.metadata or {},
+                data_set_id=extpipe.data_set_id,
+            )
+        return index
+
+    @staticmethod
+    def query(
+        config_index: PipelineIndex,
+        filters: dict[IndexKind, Iterable[str]],
+        live_index: Optional[PipelineIndex] = None,
+    ) -> dict[str, Any]:
+        """Pipelines matching all filters, from the config and optionally from CDF
+
+        Returns:
+            dict[str, Any]: query report
+        """
+        filters = {_kind: list(_values) for _kind, _values in filters.items() if _values}
+        pipelines: dict[str, dict[str, Any]] = {}
+        for source, index in (("config", config_index), ("cdf", live_index)):
+            if index is None:
+                continue
+            for external_id, data_set, schedule in index.select(filters):
+                pipeline = pipelines.setdefault(
+                    external_id,
+                    {"external_id": external_id, "data_set": data_set, "schedule": schedule, "config": False},
+                )
+                pipeline[source] = True
+        if live_index is not None:
+            for pipeline in pipelines.values():
+                pipeline.setdefault("cdf", False)
+
+        return {
+            "query": {_kind.value: _values for _kind, _values in filters.items()},
+            "live": live_index is not None,
+            "pipelines": list(pipelines.values()),
+        }
+
+    @staticmethod
+    def render(report: dict[str, Any], format: ReportFormat) -> str:
+        return render_report(report, format, _as_table)
@@ -0,0 +1,218 @@
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from enum import ReprEnum
+from functools import lru_cache
+from typing import Any, Optional
+
+from cognite.client.data_classes import ExtractionPipeline
+from rich.table import Table
+
+from ..app_config import CRON_OR_FIXED_PATTERN
+from ..common.reports import ReportFormat, render_report
+from .base import CommandBase
+
+
+class RunStatus(str, ReprEnum):
+    SUCCESS = "success"
+    FAILURE = "failure"
+    SEEN = "seen"
+    # existing in CDF, but never reported a run
+    NEVER = "never"
+    # configured, but not existing in CDF
+    MISSING = "missing"
+
+
+# fixed intervals of the '@' shortcuts, '@reboot' has no interval
+SCHEDULE_SHORTCUTS = {
+    "@annually": timedelta(days=366),
+    "@yearly": timedelta(days=366),
+    "@monthly": timedelta(days=31),
+    "@weekly": timedelta(weeks=1),
+    "@daily": timedelta(days=1),
+    "@hourly": timedelta(hours=1),
+}
+
+# go-style durations used by '@every', like '1h30m' (no days supported)
+DURATION_UNITS = {
+    "ns": timedelta(microseconds=0.001),
+    "us": timedelta(microseconds=1),
+    "µs": timedelta(microseconds=1),
+    "ms": timedelta(milliseconds=1),
+    "s": timedelta(seconds=1),
+    "m": timedelta(minutes=1),
+    "h": timedelta(hours=1),
+}
+
+
+def _expand_cron_field(field: str, first: int, last: int) -> list[int]:
+    """Expand a single cron field (like '*/15', '1,2,3', '8-17', '8-17/2', '5/10' or '0') to its sorted values
+
+    Raises:
+        ValueError: if the field can't be parsed, or has a step of 0
+    """
+    values: set[int] = set()
+    for token in field.split(","):
+        token, _, step = token.partition("/")
+        if token == "*":
+            start, end = first, last
+        elif "-" in token:
+            start, end = map(int, token.split("-"))
+        else:
+            # a single value, or the start of a step like '5/10'
+            start = int(token)
+            end = last if step else start
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return sorted(values)
+
+
+def _max_cyclic_gap(values: list[int], cycle: int) -> int:
+    """Longest distance between two consecutive values, wrapping around at 'cycle'"""
+    if not values:
+        return cycle
+    return max(_next - _prev for _prev, _next in zip(values, [*values[1:], values[0] + cycle]))
+
+
+@lru_cache(maxsize=None)
+def _schedule_interval(schedule: Optional[str]) -> Optional[timedelta]:
+    """Longest expected interval between two runs of a schedule following `CRON_OR_FIXED_PATTERN`.
+    For cron expressions this is an upper bound, calculated from the minute/hour fields,
+    or the restricted day fields (day-of-month, month, day-of-week).
+
+    Args:
+        schedule (Optional[str]): 'On trigger', 'Continuous', '@daily', '@every 1h30m' or cron expression
+
+    Returns:
+        Optional[timedelta]: the interval, or None if the schedule doesn't have one or can't be parsed
+    """
+    if not schedule or not re.match(CRON_OR_FIXED_PATTERN, schedule) or schedule in ("On trigger", "Continuous"):
+        return None
+
+    if schedule.startswith("@every "):
+        return sum(
+            (
+                int(_value) * DURATION_UNITS[_unit]
+                for _value, _unit in re.findall(r"(\d+)(ns|us|µs|ms|s|m|h)", schedule)
+            ),
+            timedelta(),
+        )
+    if schedule.startswith("@"):
+        return SCHEDULE_SHORTCUTS.get(schedule)
+
+    try:
+        return _cron_interval(schedule)
+    except ValueError as e:
+        # the pattern accepts some expressions which aren't valid cron, like '*/0' or 'Continuous foo'
+        logging.warning(f"Skipping unsupported schedule '{schedule}': {e}")
+        return None
+
+
+def _cron_interval(schedule: str) -> timedelta:
+    """Interval of a cron expression, raises ValueError if it can't be parsed"""
+    fields = schedule.split()
+    # 6 and 7 fields variants have a leading 'seconds' field, 7 fields have a trailing 'year' field
+    if len(fields) > 5:
+        fields = fields[1:6]
+    minute, hour, day_of_month, month, day_of_week = fields
+
+    if month != "*":
+        # approximated with 31 days per month
+        return timedelta(days=31 * _max_cyclic_gap(_expand_cron_field(month, 1, 12), 12))
+    if day_of_month != "*":
+        return timedelta(days=_max_cyclic_gap(_expand_cron_field(day_of_month, 1, 31), 31))
+    if day_of_week != "*":
+        return timedelta(days=_max_cyclic_gap(_expand_cron_field(day_of_week, 0, 6), 7))
+
+    minutes_of_day = sorted(
+        _h * 60 + _m for _h in _expand_cron_field(hour, 0, 23) for _m in _expand_cron_field(minute, 0, 59)
+    )
+    return timedelta(minutes=_max_cyclic_gap(minutes_of_day, 24 * 60))
+
+
+def latest_run(extpipe: Optional[ExtractionPipeline]) -> tuple[RunStatus, Optional[int]]:
+    if extpipe is None:
+        return RunStatus.MISSING, None
+
+    runs = {
+        RunStatus.SUCCESS: extpipe.last_success,
+        RunStatus.FAILURE: extpipe.last_failure,
+        RunStatus.SEEN: extpipe.last_seen,
+    }
+    status, timestamp = max(runs.items(), key=lambda _run: _run[1] or 0)
+    return (status, timestamp) if timestamp else (RunStatus.NEVER, None)
+
+
+def _as_table(report: dict[str, Any]) -> Table:
+    table = Table(title=f"Extraction Pipelines status: {report['project']}")
+    table.add_column("group")
+    table.add_column("key")
+    for status in RunStatus:
+        table.add_column(status.value, justify="right")
+    table.add_column("late", justify="right")
+
+    for group in ("data_sets", "contacts"):
+        for key, counts in report[group].items():
+            table.add_row(group, key, *[str(counts.get(_s, 0)) for _s in [*(_r.value for _r in RunStatus), "late"]])
+    return table
+
+
+class CommandStatus(CommandBase):
+    def command(self, grace: timedelta = timedelta(minutes=10)) -> dict[str, Any]:
+        """Summarize the latest runs of all configured extpipes per data set and contact,
+        and flag extpipes without any run within their schedule (plus 'grace').
+
+        The latest runs are taken from the `last_success`, `last_failure` and `last_seen` fields,
+        fetched with one `retrieve_multiple`, which the SDK splits into concurrent requests
+        of max 1000 external-ids each.
+
+        Returns:
+            dict[str, Any]: status report
+        """
+        external_ids = {self.pipeline_external_id(pipeline): pipeline for pipeline in self.extpipes_config.pipelines}
+        existing_extpipes = {
+            _e.external_id: _e
+            for _e in self.client.extraction_pipelines.retrieve_multiple(
+                external_ids=list(external_ids), ignore_unknown_ids=True
+            )
+        }
+        logging.debug(f"Retrieved {len(existing_extpipes)} of {len(external_ids)} configured extraction pipelines")
+
+        now = int(time.time() * 1000)
+        data_sets: dict[str, Counter] = defaultdict(Counter)
+        contacts: dict[str, Counter] = defaultdict(Counter)
+        late: list[dict[str, Any]] = []
+
+        for external_id, pipeline in external_ids.items():
+            extpipe = existing_extpipes.get(external_id)
+            status, timestamp = latest_run(extpipe)
+
+            counters = [
+                data_sets[pipeline.data_set_key],
+                *[contacts[_email] for _email in {_c.email for _c in [*pipeline.contacts, *self.default_contacts]}],
+            ]
+            for counter in counters:
+                counter[status.value] += 1
+
+            interval = _schedule_interval(pipeline.schedule)
+            if extpipe is not None and interval is not None:
+                if timestamp is None or now - timestamp > (interval + grace) / timedelta(milliseconds=1):
+                    late.append({"external_id": external_id, "schedule": pipeline.schedule, "last_run": timestamp})
+                    for counter in counters:
+                        counter["late"] += 1
+
+        if late:
+            logging.warning(f"Detected {len(late)} late extraction pipelines")
+
+        return {
+            "project": self.cdf_project,
+            "timestamp": now,
+            "data_sets": {_k: dict(_v) for _k, _v in data_sets.items()},
+            "contacts": {_k: dict(_v) for _k, _v in contacts.items()},
+            "late": late,
+        }
+
+    @staticmethod
+    def render(report: dict[str, Any], format: ReportFormat) -> str:
+        return render_report(report, format, _as_table)
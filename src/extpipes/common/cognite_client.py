@@ -1,12 +1,90 @@
 import logging.config
+import tempfile
+from enum import ReprEnum
+from pathlib import Path
+from typing import Optional
 
 # TODO: PEP 484 Stub Files issue?
-from cognite.client import ClientConfig, CogniteClient
+from cognite.client import ClientConfig, CogniteClient, global_config
 from cognite.client.credentials import OAuthClientCredentials
-from pydantic import Field, field_validator
+from pydantic import Field, field_validator, model_validator
 
 from .. import __version__
 from ..common.base_model import Model
+from .token_cache import CachedOAuthClientCredentials, TokenCache
+
+
+class TokenCacheConfig(Model):
+    # share access tokens between cli runs on the same machine (e.g. parallel CI jobs)
+    enabled: bool = Field(default=True)
+    path: Path = Field(default=Path(tempfile.gettempdir()) / "extpipes-cli-tokens")
+    # tokens are refreshed this number of seconds before they expire
+    refresh_margin_seconds: int = Field(default=60, ge=0)
+
+
+class HttpPreset(str, ReprEnum):
+    # cognite-sdk defaults
+    DEFAULT = "default"
+    # concurrent discovery and writes of thousands of extpipes
+    HIGH_THROUGHPUT = "high-throughput"
+    # tens of thousands of extpipes, if the CDF project has no other heavy API users
+    MAX_THROUGHPUT = "max-throughput"
+
+
+HTTP_PRESETS: dict[HttpPreset, dict[str, int]] = {
+    HttpPreset.DEFAULT: dict(
+        max_workers=10,
+        max_connection_pool_size=50,
+        timeout=30,
+        max_retries=10,
+        max_retries_connect=3,
+        max_retry_backoff=30,
+    ),
+    HttpPreset.HIGH_THROUGHPUT: dict(
+        max_workers=32,
+        max_connection_pool_size=64,
+        timeout=60,
+        max_retries=10,
+        max_retries_connect=3,
+        max_retry_backoff=30,
+    ),
+    HttpPreset.MAX_THROUGHPUT: dict(
+        max_workers=64,
+        max_connection_pool_size=128,
+        timeout=90,
+        max_retries=15,
+        max_retries_connect=5,
+        max_retry_backoff=60,
+    ),
+}
+
+
+class CogniteHttpConfig(Model):
+    # a preset provides all values, which can be overwritten one by one
+    preset: HttpPreset = Field(default=HttpPreset.DEFAULT)
+    # max number of concurrent requests of a single SDK call (e.g. a large 'retrieve_multiple')
+    max_workers: Optional[int] = Field(default=None, ge=1, le=256)
+    # max number of kept-alive connections, should be at least 'max-workers'
+    max_connection_pool_size: Optional[int] = Field(default=None, ge=1, le=1024)
+    # seconds
+    timeout: Optional[int] = Field(default=None, ge=1, le=600)
+    max_retries: Optional[int] = Field(default=None, ge=0, le=100)
+    max_retries_connect: Optional[int] = Field(default=None, ge=0, le=100)
+    # seconds
+    max_retry_backoff: Optional[int] = Field(default=None, ge=0, le=600)
+
+    @model_validator(mode="after")
+    def apply_preset(self) -> "CogniteHttpConfig":
+        for key, value in HTTP_PRESETS[self.preset].items():
+            if getattr(self, key) is None:
+                setattr(self, key, value)
+
+        if self.max_connection_pool_size < self.max_workers:  # type: ignore
+            raise ValueError(
+                f"max-connection-pool-size ({self.max_connection_pool_size}) must be at least "
+                f"max-workers ({self.max_workers}), otherwise connections get discarded and reopened"
+            )
+        return self
 
 
 class CogniteIdpConfig(Model):
@@ -16,12 +94,14 @@ class CogniteIdpConfig(Model):
     secret: str
     scopes: list[str]
     token_url: str
+    token_cache: Optional[TokenCacheConfig] = Field(default=None)
 
 
 class CogniteConfig(Model):
     host: str
     project: str
     idp_authentication: CogniteIdpConfig
+    http: CogniteHttpConfig = Field(default_factory=CogniteHttpConfig)
 
     # compatibility properties to keep get_cognite_client() in sync with other solutions
     # which are using flat-property list, no nesting and a bit different names
@@ -49,6 +129,11 @@ class CogniteConfig(Model):
     def client_secret(self) -> str:
         return self.idp_authentication.secret
 
+    @property
+    def token_cache(self) -> Optional[TokenCacheConfig]:
+        token_cache = self.idp_authentication.token_cache
+        return token_cache if token_cache and token_cache.enabled else None
+
     @field_validator("host")
     @classmethod
     def host_must_contain_https(cls, v: str) -> str:
@@ -65,18 +150,37 @@ def get_cognite_client(cognite_config: CogniteConfig) -> CogniteClient:
     try:
         logging.debug("Attempt to create CogniteClient")
 
-        credentials = OAuthClientCredentials(
+        credentials_kwargs = dict(
             token_url=cognite_config.token_url,
             client_id=cognite_config.client_id,
             client_secret=cognite_config.client_secret,
             scopes=cognite_config.scopes,
         )
+        if token_cache := cognite_config.token_cache:
+            logging.debug(f"Using token cache in {token_cache.path}")
+            credentials = CachedOAuthClientCredentials(
+                token_cache=TokenCache(directory=token_cache.path, **credentials_kwargs),  # type: ignore
+                refresh_margin_seconds=token_cache.refresh_margin_seconds,
+                **credentials_kwargs,
+            )
+        else:
+            credentials = OAuthClientCredentials(**credentials_kwargs)  # type: ignore
+
+        # global settings, only applied if set before the first request
+        http = cognite_config.http
+        global_config.max_connection_pool_size = http.max_connection_pool_size
+        global_config.max_retries = http.max_retries
+        global_config.max_retries_connect = http.max_retries_connect
+        global_config.max_retry_backoff = http.max_retry_backoff
+        logging.debug(f"HTTP settings from preset '{http.preset}': {http.model_dump(exclude={'preset'})}")
 
         cnf = ClientConfig(
             client_name=cognite_config.client_name,
             base_url=cognite_config.base_url,
             project=cognite_config.project,
             credentials=credentials,
+            max_workers=http.max_workers,
+            timeout=http.timeout,
         )
         logging.debug(f"get CogniteClient for {cognite_config.project=}")
 
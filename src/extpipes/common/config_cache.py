@@ -0,0 +1,64 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Any, Optional
+
+from .. import __version__
+from .file_utils import write_atomic
+from .http_recording import SECRET_KEY_PATTERN
+
+# cache files are kept in this folder, next to the config file
+CACHE_DIRECTORY = ".extpipes-cache"
+
+# names of environment variables expanded in the config, like '${CDF_PROJECT}'
+ENVVAR_PATTERN = re.compile(r"\$\{([A-Za-z_][A-Za-z0-9_]*)")
+
+
+class ConfigCache:
+    """Cache of data derived from a config file, e.g. indexes, to skip loading and validating the config.
+
+    Entries are keyed by a hash of the config file, the values of the environment variables it references
+    (except secrets), the cli version and the entry 'kind'. Only the latest entry of a 'kind' is kept per config file.
+    """
+
+    def __init__(self, config_path: Path, kind: str):
+        self.config_path = config_path
+        self.kind = kind
+        self.directory = config_path.parent / CACHE_DIRECTORY
+        self.key = self.config_key()
+        self.path = self.directory / f"{config_path.name}.{self.key}.{kind}.json"
+
+    def config_key(self) -> str:
+        content = self.config_path.read_bytes()
+        envvars = sorted(
+            {_name for _name in ENVVAR_PATTERN.findall(content.decode()) if not SECRET_KEY_PATTERN.search(_name)}
+        )
+        digest = hashlib.sha256(f"{self.kind}|{__version__}|".encode())
+        digest.update(content)
+        for name in envvars:
+            digest.update(f"|{name}={os.getenv(name, '')}".encode())
+        return digest.hexdigest()[:32]
+
+    def load(self) -> Optional[Any]:
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logging.debug(f"Ignoring unreadable cache file: {self.path}")
+            return None
+
+    def save(self, value: Any) -> None:
+        try:
+            self.directory.mkdir(exist_ok=True)
+            # remove outdated entries of this config file
+            for outdated in self.directory.glob(f"{self.config_path.name}.*.{self.kind}.json"):
+                outdated.unlink(missing_ok=True)
+            write_atomic(self.path, json.dumps(value, separators=(",", ":")).encode(), mode=0o644)
+        except OSError as e:
+            # e.g. a read-only mount, the cache is optional
+            logging.warning(f"Could not write cache file {self.path}: {e}")
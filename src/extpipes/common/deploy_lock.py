@@ -0,0 +1,234 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from cognite.client import CogniteClient
+
+from ..app_exceptions import ExtpipesLockError
+from .file_utils import locked_file
+
+LockState = dict[str, Any]
+
+
+class LockBackend(ABC):
+    """Storage of the lock states by key. The state is a json-like dict of 'holder' (run-id),
+    'expires_at' (epoch seconds), 'revision' (of the holder) and 'queue', the revisions announced by all live runs
+    as {run-id: {'revision': .., 'expires_at': ..}}.
+    """
+
+    # if 'update' isn't atomic, an acquired lock is confirmed by reading it back after 'settle_seconds'
+    atomic: bool = False
+    settle_seconds: float = 2.0
+
+    @abstractmethod
+    def read(self, key: str) -> LockState:
+        ...
+
+    @abstractmethod
+    def update(self, key: str, func: Callable[[LockState], LockState]) -> LockState:
+        """Read the state, apply 'func' and write the new state
+
+        Returns:
+            LockState: the new state
+        """
+
+
+class FileLockBackend(LockBackend):
+    """All lock states in one json file, updated under an exclusive file lock.
+    File locks are only available on posix, elsewhere this backend isn't safe for parallel runs.
+    """
+
+    atomic = True
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def _load(self, fh) -> dict[str, LockState]:
+        fh.seek(0)
+        content = fh.read()
+        return json.loads(content) if content else {}
+
+    def read(self, key: str) -> LockState:
+        return self.update(key, lambda _state: _state)
+
+    def update(self, key: str, func: Callable[[LockState], LockState]) -> LockState:
+        with locked_file(self.path) as fh:
+            states = self._load(fh)
+            state = states[key] = func(states.get(key, {}))
+            fh.seek(0)
+            fh.truncate()
+            json.dump(states, fh)
+            return state
+
+
+class RawLockBackend(LockBackend):
+    """One row per key in a CDF RAW table. RAW has no conditional writes, concurrent updates are
+    resolved by the last writer, which all runs read back after 'settle_seconds'.
+    """
+
+    def __init__(self, client: CogniteClient, db_name: str, table_name: str):
+        self.client = client
+        self.db_name = db_name
+        self.table_name = table_name
+
+    def read(self, key: str) -> LockState:
+        row = self.client.raw.rows.retrieve(self.db_name, self.table_name, key)
+        return dict(row.columns or {}) if row else {}
+
+    def update(self, key: str, func: Callable[[LockState], LockState]) -> LockState:
+        current = self.read(key)
+        state = func(current)
+        if state != current:
+            self.client.raw.rows.insert(self.db_name, self.table_name, row={key: state}, ensure_parent=True)
+        return state
+
+
+class DeployLock:
+    """Lease-based lock of deploy runs against the same key (e.g. CDF project), which coalesces waiting runs:
+    each run announces its revision in a queue, and runs with an older revision than the newest announced one
+    are superseded. Queue entries expire like leases, so finished or crashed runs don't supersede later ones.
+    Runs w/o a revision only wait for the lock, they neither supersede nor get superseded.
+    The holder renews its lease from a background thread, so only crashed runs let their lease expire.
+    """
+
+    def __init__(
+        self,
+        backend: LockBackend,
+        key: str,
+        revision: Optional[int] = None,
+        lease_seconds: int = 300,
+        wait_seconds: int = 1800,
+        poll_seconds: int = 10,
+    ):
+        self.backend = backend
+        self.key = key
+        self.revision = revision
+        self.lease_seconds = lease_seconds
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+        self.run_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lost = False
+        self._stop = threading.Event()
+        self._renewal: Optional[threading.Thread] = None
+
+    def _is_free(self, state: LockState) -> bool:
+        return state.get("holder") in (None, self.run_id) or state.get("expires_at", 0) < time.time()
+
+    def newest_revision(self, state: LockState) -> Optional[int]:
+        """Newest revision announced by a live run"""
+        now = time.time()
+        revisions = [
+            _entry["revision"]
+            for _entry in state.get("queue", {}).values()
+            if _entry.get("revision") is not None and _entry.get("expires_at", 0) >= now
+        ]
+        return max(revisions, default=None)
+
+    def _is_superseded(self, state: LockState) -> bool:
+        newest = self.newest_revision(state)
+        return self.revision is not None and newest is not None and newest > self.revision
+
+    def _announce(self, state: LockState) -> LockState:
+        # expired entries of finished or crashed runs are dropped, the own entry is (re-)added
+        now = time.time()
+        queue = {_run_id: _entry for _run_id, _entry in state.get("queue", {}).items() if _entry["expires_at"] >= now}
+        # waiting runs re-announce each poll, so their entry must outlive the poll interval
+        queue[self.run_id] = {
+            "revision": self.revision,
+            "expires_at": now + max(self.lease_seconds, 2 * self.poll_seconds),
+        }
+        return {**state, "queue": queue}
+
+    def _leave(self, state: LockState) -> LockState:
+        queue = {_run_id: _entry for _run_id, _entry in state.get("queue", {}).items() if _run_id != self.run_id}
+        if state.get("holder") == self.run_id:
+            return {**state, "queue": queue, "holder": None, "expires_at": 0}
+        return {**state, "queue": queue}
+
+    def _take(self, state: LockState) -> LockState:
+        if self._is_superseded(state) or not self._is_free(state):
+            return state
+        return {
+            **self._announce(state),
+            "holder": self.run_id,
+            "revision": self.revision,
+            "expires_at": time.time() + self.lease_seconds,
+        }
+
+    def acquire(self) -> bool:
+        """Wait for the lock, until it is acquired or a newer revision got announced
+
+        Returns:
+            bool: True if acquired, False if superseded
+        """
+        deadline = time.time() + self.wait_seconds
+        state = self.backend.update(self.key, self._announce)
+        while True:
+            if self._is_superseded(state):
+                logging.warning(
+                    f"Deploy of revision {self.revision} is superseded by revision {self.newest_revision(state)}"
+                )
+                self.backend.update(self.key, self._leave)
+                return False
+
+            if self._is_free(state):
+                state = self.backend.update(self.key, self._take)
+                if not self.backend.atomic and state.get("holder") == self.run_id:
+                    # another run might have written at the same time, the last writer wins
+                    self._stop.wait(self.backend.settle_seconds)
+                    state = self.backend.read(self.key)
+                if state.get("holder") == self.run_id:
+                    logging.info(f"Acquired deploy lock '{self.key}' for revision {self.revision}")
+                    self._renewal = threading.Thread(target=self._renew, name="deploy-lock-renewal", daemon=True)
+                    self._renewal.start()
+                    return True
+                continue
+
+            if time.time() > deadline:
+                self.backend.update(self.key, self._leave)
+                raise ExtpipesLockError(
+                    f"Deploy lock '{self.key}' is held by {state.get('holder')} (revision {state.get('revision')}), "
+                    f"gave up after {self.wait_seconds}s"
+                )
+            logging.info(f"Waiting for deploy lock '{self.key}' held by {state.get('holder')}")
+            self._stop.wait(self.poll_seconds)
+            # renews the own queue entry, and re-adds it in case a concurrent write of another run dropped it
+            state = self.backend.update(self.key, self._announce)
+
+    def _renew(self) -> None:
+        def extend(state: LockState) -> LockState:
+            if state.get("holder") != self.run_id:
+                return state
+            return {**self._announce(state), "expires_at": time.time() + self.lease_seconds}
+
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if self.backend.update(self.key, extend).get("holder") != self.run_id:
+                    logging.error(f"Lost deploy lock '{self.key}'")
+                    self.lost = True
+                    return
+            except Exception as e:
+                # retried with the next renewal, the lease is still valid for 2/3 of its time
+                logging.warning(f"Failed to renew deploy lock '{self.key}': {e}")
+
+    def is_superseded(self) -> bool:
+        """If a newer revision got announced since acquiring the lock"""
+        if self.lost:
+            raise ExtpipesLockError(f"Lost deploy lock '{self.key}', its lease expired")
+        return self._is_superseded(self.backend.read(self.key))
+
+    def release(self) -> None:
+        self._stop.set()
+        if self._renewal:
+            self._renewal.join()
+
+        # the own revision leaves the queue, so it doesn't supersede later runs
+        self.backend.update(self.key, self._leave)
+        logging.info(f"Released deploy lock '{self.key}'")
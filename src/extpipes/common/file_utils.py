@@ -0,0 +1,45 @@
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+
+try:
+    # file locks are only available on posix, elsewhere files aren't locked and parallel runs aren't serialized
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+
+@contextmanager
+def locked_file(path: Path) -> Iterator[IO[str]]:
+    """Open a file for reading and writing (created if missing, only readable by the user),
+    and hold an exclusive lock on it, which makes other processes wait
+
+    Args:
+        path (Path): the file to lock
+
+    Returns:
+        Iterator[IO[str]]: the opened file
+    """
+    with open(os.open(path, os.O_RDWR | os.O_CREAT, 0o600), "r+", encoding="utf-8") as fh:
+        if fcntl:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield fh
+        finally:
+            if fcntl:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def write_atomic(path: Path, content: bytes, mode: int = 0o600) -> None:
+    """Write to a temporary file and rename it, so concurrent readers never see a partial file
+
+    Args:
+        path (Path): the file to replace
+        content (bytes): the new content
+        mode (int, optional): permissions of a new file. Defaults to 0o600, only readable by the user.
+    """
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode), "wb") as fh:
+        fh.write(content)
+    os.replace(tmp_path, path)
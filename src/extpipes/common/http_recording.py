@@ -0,0 +1,215 @@
+import atexit
+import gzip
+import json
+import logging
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from pathlib import Path
+from typing import IO, Any, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from cognite.client import CogniteClient, global_config
+from cognite.client._http_client import get_global_requests_session
+from cognite.client.credentials import Token
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3 import Retry
+
+RECORDING_VERSION = 1
+
+# values of matching keys in request and response bodies are replaced
+SECRET_KEY_PATTERN = re.compile(r"secret|password|token|api[-_]?key|credential", re.IGNORECASE)
+SCRUBBED = "***"
+
+# the project is replaced, to replay a recording against any project (e.g. from a mocked .env)
+PROJECT_PATH_PATTERN = re.compile(r"^(/api/[^/]+/projects/)[^/]+")
+
+
+def _scrub(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {_k: SCRUBBED if SECRET_KEY_PATTERN.search(_k) else _scrub(_v) for _k, _v in value.items()}
+    if isinstance(value, list):
+        return [_scrub(_v) for _v in value]
+    return value
+
+
+def _endpoint(method: str, url: str) -> str:
+    """Identifies a request endpoint independent of host, project and query parameter order"""
+    parts = urlsplit(url)
+    path = PROJECT_PATH_PATTERN.sub(r"\1<project>", parts.path)
+    query = urlencode(sorted(parse_qsl(parts.query)))
+    return f"{method} {path}?{query}"
+
+
+def _payload_key(endpoint: str, payload: Any) -> str:
+    return f"{endpoint} {json.dumps(payload, sort_keys=True)}"
+
+
+def _request_body(request: requests.PreparedRequest) -> Any:
+    body = request.body
+    if not body:
+        return None
+    if isinstance(body, bytes) and request.headers.get("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    try:
+        return _scrub(json.loads(body))
+    except ValueError:
+        # not json, only keep the size
+        return {"bytes": len(body)}
+
+
+def _open_recording(path: Path, mode: str) -> IO[str]:
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")  # type: ignore
+    return open(path, mode, encoding="utf-8")
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Forwards all requests, and appends each exchange as one json line to the recording.
+    Request headers (incl. the 'Authorization' header) are not recorded, secret-like keys in bodies are scrubbed.
+    """
+
+    def __init__(self, path: Path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = _open_recording(path, "w")
+        self.file.write(json.dumps({"version": RECORDING_VERSION, "recorded_at": time.time()}) + "\n")
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:  # type: ignore[override]
+        response = super().send(request, **kwargs)
+        try:
+            response_body = _scrub(response.json()) if response.content else None
+        except ValueError:
+            response_body = {"text": response.text}
+        exchange = {
+            "request": _endpoint(request.method, request.url),  # type: ignore
+            "payload": _request_body(request),
+            "status": response.status_code,
+            "content_type": response.headers.get("Content-Type"),
+            "body": response_body,
+            "elapsed": response.elapsed.total_seconds(),
+        }
+        with self.lock:
+            self.file.write(json.dumps(exchange, separators=(",", ":")) + "\n")
+        return response
+
+    def close(self) -> None:
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+                logging.info(f"HTTP exchanges recorded to: {self.path}")
+        super().close()
+
+
+class ReplayAdapter(HTTPAdapter):
+    """Serves requests from a recording w/o network access, each one after its recorded latency
+    times 'latency_scale'. A request is matched by endpoint and payload, or if the payload differs
+    (e.g. a timestamp in the metadata), by endpoint only. Matches are served in their recorded order.
+    Requests w/o a recorded response get a '501 Not Implemented' response.
+    """
+
+    def __init__(self, path: Path, latency_scale: float = 1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_scale = latency_scale
+        self.lock = threading.Lock()
+        self.exchanges: list[dict] = []
+        self.used: set[int] = set()
+        # positions of the exchanges by endpoint with payload, and by endpoint only
+        self.by_payload: dict[str, deque[int]] = defaultdict(deque)
+        self.by_endpoint: dict[str, deque[int]] = defaultdict(deque)
+        with _open_recording(path, "r") as fh:
+            header = json.loads(fh.readline())
+            if header.get("version") != RECORDING_VERSION:
+                raise ValueError(f"Unsupported recording version: {header.get('version')}")
+            for position, line in enumerate(fh):
+                exchange = json.loads(line)
+                self.exchanges.append(exchange)
+                self.by_payload[_payload_key(exchange["request"], exchange["payload"])].append(position)
+                self.by_endpoint[exchange["request"]].append(position)
+
+    @property
+    def unused(self) -> int:
+        """Number of recorded exchanges not replayed yet"""
+        return len(self.exchanges) - len(self.used)
+
+    def _next(self, positions: Optional[deque[int]]) -> Optional[dict]:
+        while positions:
+            if (position := positions.popleft()) not in self.used:
+                self.used.add(position)
+                return self.exchanges[position]
+        return None
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:  # type: ignore[override]
+        endpoint = _endpoint(request.method, request.url)  # type: ignore
+        with self.lock:
+            exchange = self._next(self.by_payload.get(_payload_key(endpoint, _request_body(request))))
+            if exchange is None and (exchange := self._next(self.by_endpoint.get(endpoint))):
+                logging.debug(f"Replaying recorded response with a different payload for: {endpoint}")
+
+        if exchange is None:
+            logging.error(f"No recorded response for: {endpoint}")
+            exchange = {
+                "status": 501,
+                "content_type": "application/json",
+                "body": {"error": {"code": 501, "message": f"No recorded response for: {endpoint}"}},
+                "elapsed": 0,
+            }
+        elif self.latency_scale:
+            time.sleep(exchange["elapsed"] * self.latency_scale)
+
+        response = requests.Response()
+        response.status_code = exchange["status"]
+        response.headers = CaseInsensitiveDict({"Content-Type": exchange["content_type"] or "application/json"})
+        response._content = json.dumps(exchange["body"]).encode() if exchange["body"] is not None else b""
+        response.encoding = "utf-8"
+        response.url = request.url  # type: ignore
+        response.request = request
+        response.elapsed = timedelta(seconds=exchange["elapsed"])
+        return response
+
+
+def install_transport(
+    client: CogniteClient,
+    record_path: Optional[Path] = None,
+    replay_path: Optional[Path] = None,
+    latency_scale: float = 1.0,
+) -> Optional[HTTPAdapter]:
+    """Mount a recording or replaying adapter to the requests session shared by all SDK clients.
+    When replaying, the client gets a static token, so the IdP isn't contacted either.
+
+    Returns:
+        Optional[HTTPAdapter]: the mounted adapter, if any
+    """
+    if record_path and replay_path:
+        raise ValueError("Recording and replaying at the same time is not supported")
+
+    if not (record_path or replay_path):
+        return None
+
+    # the cognite-sdk has no public hook for its transport
+    session = get_global_requests_session()
+    # keep the settings of the SDK's adapter, esp. 'max_retries' disabled, as the SDK retries itself
+    sdk_adapter = session.get_adapter("https://")
+    adapter_kwargs: dict[str, Any] = {
+        "pool_maxsize": getattr(sdk_adapter, "_pool_maxsize", global_config.max_connection_pool_size),
+        "max_retries": getattr(sdk_adapter, "max_retries", Retry(False)),
+    }
+
+    adapter: HTTPAdapter
+    if record_path:
+        adapter = RecordingAdapter(record_path, **adapter_kwargs)
+        atexit.register(adapter.close)
+        logging.info(f"Recording HTTP exchanges to: {record_path}")
+    else:
+        adapter = ReplayAdapter(replay_path, latency_scale=latency_scale, **adapter_kwargs)  # type: ignore[arg-type]
+        client.config.credentials = Token("replay")
+        logging.warning(f"Replaying HTTP exchanges from: {replay_path}, no requests are sent to CDF")
+
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return adapter
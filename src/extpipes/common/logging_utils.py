@@ -0,0 +1,135 @@
+import atexit
+import copy
+import json
+import logging
+import pprint
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable
+
+# max number of items of a collection written to the log, before it gets summarized
+MAX_LOG_ITEMS = 20
+
+
+def summarize(value: Any, max_items: int = MAX_LOG_ITEMS) -> str:
+    """Pretty-printed value, with large collections shortened to their first 'max_items' items
+
+    Args:
+        value (Any): the value to log
+        max_items (int, optional): max number of items to print. Defaults to MAX_LOG_ITEMS.
+
+    Returns:
+        str: e.g. "['a', 'b'] ... (+998 more, 1000 total)"
+    """
+    if isinstance(value, (list, tuple, set, frozenset, dict)) and len(value) > max_items:
+        if isinstance(value, dict):
+            head: Any = dict(list(value.items())[:max_items])
+        else:
+            head = list(value)[:max_items]
+        return f"{pprint.pformat(head, compact=True)} ... (+{len(value) - max_items} more, {len(value)} total)"
+    return pprint.pformat(value, compact=True)
+
+
+class lazy:
+    """Log payload, which is only computed (and summarized) when a log handler formats the message.
+    Use with %-style logging instead of f-strings, which are always evaluated:
+
+        logging.debug("Existing extpipes: %s", lazy(existing_extpipes.as_external_ids))
+    """
+
+    def __init__(self, func: Callable[[], Any], max_items: int = MAX_LOG_ITEMS):
+        self.func = func
+        self.max_items = max_items
+
+    def __str__(self) -> str:
+        return summarize(self.func(), self.max_items)
+
+
+class JsonFormatter(logging.Formatter):
+    """One json object per line, to be used in a 'logging' dictConfig:
+
+    formatters:
+      json:
+        (): extpipes.common.logging_utils.JsonFormatter
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        # queued records only have the formatted 'exc_text' left
+        if exception := self.formatException(record.exc_info) if record.exc_info else record.exc_text:
+            entry["exception"] = exception
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    """Queue handler, which keeps the exception apart from the message.
+    `QueueHandler.prepare` appends the traceback to the message, so formatters of the
+    handlers behind the queue (like `JsonFormatter`) can't write it separately anymore.
+    """
+
+    exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # merged args (incl. any `lazy` payload), formatted in the calling thread
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            # the formatted text is used by all formatters instead
+            record.exc_text = record.exc_text or self.exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# (logger, queue handler, listener) of each logger using a queue
+_queued_loggers: list[tuple[logging.Logger, QueueHandler, QueueListener]] = []
+
+
+def stop_queue_logging() -> None:
+    """Flush all queued log records, stop the background writers,
+    and give the handlers back to their loggers
+    """
+    while _queued_loggers:
+        logger, queue_handler, listener = _queued_loggers.pop()
+        listener.stop()
+        logger.removeHandler(queue_handler)
+        for handler in listener.handlers:
+            logger.addHandler(handler)
+
+
+def enable_queue_logging() -> None:
+    """Move the handlers of the root logger and all configured loggers to a background thread,
+    so that writing to (slow) streams and files doesn't block the cli.
+
+    The queue handler gets the lowest level of the moved handlers, so records no handler would write,
+    are dropped before their message (and any `lazy` payload) gets formatted.
+    """
+    stop_queue_logging()
+
+    loggers = [logging.getLogger(), *logging.Logger.manager.loggerDict.values()]
+    for logger in loggers:
+        if not isinstance(logger, logging.Logger) or not logger.handlers:
+            continue
+
+        handlers = list(logger.handlers)
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler = _QueueHandler(log_queue)
+        queue_handler.setLevel(min(_h.level for _h in handlers))
+
+        for handler in handlers:
+            logger.removeHandler(handler)
+        logger.addHandler(queue_handler)
+
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        _queued_loggers.append((logger, queue_handler, listener))
+
+
+atexit.register(stop_queue_logging)
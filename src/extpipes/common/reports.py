@@ -0,0 +1,32 @@
+import json
+from enum import ReprEnum
+from typing import Any, Callable
+
+from rich.console import Console
+from rich.table import Table
+
+
+class ReportFormat(str, ReprEnum):
+    JSON = "json"
+    TABLE = "table"
+
+
+def render_report(report: dict[str, Any], format: ReportFormat, as_table: Callable[[dict[str, Any]], Table]) -> str:
+    """Render a json-like report, e.g. of the 'status' or 'query' command
+
+    Args:
+        report (dict[str, Any]): the report
+        format (ReportFormat): compact json, or a table for humans
+        as_table (Callable[[dict[str, Any]], Table]): builds the table of the report
+
+    Returns:
+        str: the rendered report
+    """
+    match format:
+        case ReportFormat.TABLE:
+            console = Console(width=200)
+            with console.capture() as capture:
+                console.print(as_table(report))
+            return capture.get()
+        case _:
+            return json.dumps(report, separators=(",", ":"))
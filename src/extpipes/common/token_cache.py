@@ -0,0 +1,77 @@
+import base64
+import hashlib
+import json
+import logging
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from cognite.client.credentials import OAuthClientCredentials
+
+# encrypts the cached tokens
+from cryptography.fernet import Fernet, InvalidToken
+
+from .file_utils import locked_file, write_atomic
+
+
+class TokenCache:
+    """Access-token cache on disk, shared by all cli runs on the same machine.
+
+    One file per client_id, scopes and token_url, encrypted with a key derived from the client secret,
+    so only runs knowing the secret can read the token. A lock-file next to it makes parallel runs wait
+    for the first one to fetch a new token, instead of each fetching its own.
+    """
+
+    def __init__(self, directory: Path, client_id: str, client_secret: str, scopes: list[str], token_url: str):
+        cache_key = hashlib.sha256("|".join([client_id, *sorted(scopes), token_url]).encode()).hexdigest()
+        self.path = directory / f"{cache_key}.token"
+        self.lock_path = directory / f"{cache_key}.lock"
+        self.fernet = Fernet(
+            base64.urlsafe_b64encode(hashlib.sha256(f"extpipes-cli-token-cache|{client_secret}".encode()).digest())
+        )
+        directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        # w/o file locks (not on posix), parallel runs just fetch their own token
+        with locked_file(self.lock_path):
+            yield
+
+    def load(self) -> Optional[tuple[str, float]]:
+        try:
+            cached = json.loads(self.fernet.decrypt(self.path.read_bytes()))
+            return cached["access_token"], cached["expires_at"]
+        except FileNotFoundError:
+            return None
+        except (InvalidToken, ValueError, KeyError) as e:
+            # e.g. the client secret got rotated, the token will be replaced
+            logging.debug(f"Ignoring unreadable token cache {self.path}: {type(e).__name__}")
+            return None
+
+    def save(self, access_token: str, expires_at: float) -> None:
+        encrypted = self.fernet.encrypt(json.dumps({"access_token": access_token, "expires_at": expires_at}).encode())
+        write_atomic(self.path, encrypted)
+
+
+class CachedOAuthClientCredentials(OAuthClientCredentials):
+    """OAuthClientCredentials, which first looks for a still valid token in the `TokenCache`,
+    before fetching a new one from the IdP.
+    """
+
+    def __init__(self, token_cache: TokenCache, refresh_margin_seconds: int, **kwargs):
+        super().__init__(token_expiry_leeway_seconds=refresh_margin_seconds, **kwargs)
+        self.token_cache = token_cache
+        self.refresh_margin_seconds = refresh_margin_seconds
+
+    def _refresh_access_token(self) -> tuple[str, float]:
+        with self.token_cache.lock():
+            cached = self.token_cache.load()
+            if cached and time.time() < cached[1] - self.refresh_margin_seconds:
+                logging.debug("Reusing cached access token")
+                return cached
+
+            access_token, expires_at = super()._refresh_access_token()
+            self.token_cache.save(access_token, expires_at)
+            logging.debug("Fetched and cached new access token")
+            return access_token, expires_at
@@ -0,0 +1,19 @@
+import pytest
+from cognite.client._http_client import get_global_requests_session
+
+
+@pytest.fixture(autouse=True)
+def logs_in_tmp_path(tmp_path, monkeypatch):
+    # the example configs log to './logs/deploy-trading.log', which must not end up in the repo
+    (tmp_path / "logs").mkdir()
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def restore_session():
+    # remount the SDK's own adapters (e.g. w/ retries disabled), not plain ones
+    session = get_global_requests_session()
+    adapters = {_prefix: session.get_adapter(_prefix) for _prefix in ("https://", "http://")}
+    yield
+    for prefix, adapter in adapters.items():
+        session.mount(prefix, adapter)
@@ -1,15 +1,24 @@
 from pathlib import Path
+from typing import Iterator
 
 import pytest
+import yaml
+from pydantic import ValidationError
 from rich import print
 
-from extpipes.app_config import CommandMode
+from extpipes.app_config import (
+    CommandMode,
+    Pipeline,
+    _expand_templates,
+    validate_extpipes_config,
+)
 from extpipes.app_container import (
+    YAML_LOADER,
     ContainerSelector,
     DeployCommandContainer,
     init_container,
 )
-from extpipes.commands.deploy import _render_template
+from extpipes.commands.base import render_template
 from tests.constants import ROOT_DIRECTORY
 
 print(ROOT_DIRECTORY)
@@ -61,4 +70,99 @@ def test_deploy_config_01_is_valid(example_file: Path, dotenv_path: Path):
     assert container.cognite_client().config.project
     if container.extpipes().features.naming_pattern:
         for _pipeline in container.extpipes().pipelines:
-            assert _render_template(container.extpipes().features.naming_pattern, _pipeline.metadata)
+            assert render_template(container.extpipes().features.naming_pattern, _pipeline.metadata)
+
+
+def generate_pipelines(count: int) -> list[dict]:
+    return [
+        {"external-id": f"src:{_i:03}", "data-set-external-id": "src", "schedule": "Continuous"} for _i in range(count)
+    ]
+
+
+def test_duplicate_external_ids_are_rejected():
+    pipelines = generate_pipelines(3)
+    pipelines[2]["external-id"] = "src:000"
+    with pytest.raises(ValidationError, match="external_id must be unique"):
+        validate_extpipes_config({"pipelines": pipelines})
+
+
+def test_templates_and_groups_are_expanded():
+    contact = {"name": "Fizz", "email": "fizz@cognite.com", "role": "admin", "send-notification": False}
+    config = validate_extpipes_config(
+        {
+            "templates": {
+                "sap": {"data-set-external-id": "src:001:sap", "schedule": "Continuous", "contacts": [contact]},
+            },
+            "groups": [
+                {
+                    "defaults": {"template": "sap", "schedule": "@hourly", "metadata": {"team": "a"}},
+                    "pipelines": [
+                        {"external-id": f"src:001:sap:{_i}", "metadata": {"table": f"{_i}"}} for _i in range(2)
+                    ],
+                }
+            ],
+            "pipelines": [{"template": "sap", "external_id": "src:002", "data_set_external_id": "src:002"}],
+        }
+    )
+
+    # expanded lazily, while being validated
+    expanded, expander = _expand_templates({"groups": [{"pipelines": [{"external-id": "a"}]}]})
+    assert isinstance(expanded["pipelines"], Iterator) and expander.sources == []
+
+    top_level, *grouped = config.pipelines
+    assert (top_level.data_set_external_id, top_level.schedule) == ("src:002", "Continuous")
+    assert [(_p.data_set_external_id, _p.schedule) for _p in grouped] == [("src:001:sap", "@hourly")] * 2
+    assert grouped[1].metadata["team"] == "a" and grouped[1].metadata["table"] == "1"
+    # unchanged sub-objects are validated once and shared
+    assert top_level.contacts[0] is grouped[0].contacts[0] is grouped[1].contacts[0]
+
+
+def test_unknown_template_is_rejected():
+    with pytest.raises(ValidationError, match="Unknown pipeline template: 'sap'"):
+        validate_extpipes_config({"pipelines": [{"template": "sap", "external-id": "a"}], "templates": {}})
+
+
+def test_template_and_group_errors_are_located_in_the_config():
+    with pytest.raises(ValidationError) as e:
+        validate_extpipes_config(
+            {
+                "templates": {
+                    "sap": {"data-set-external-id": "src:001:sap", "schedule": "Continuous"},
+                    "broken": {"data-set-id": 1, "contacts": [{"name": "Fizz"}], "unknown": True},
+                },
+                "groups": [
+                    {"defaults": {"template": "sap"}, "pipelines": [{"external-id": "a"}, {"schedule": "never"}]},
+                    # left out, reported once at the template
+                    {"defaults": {"template": "broken"}, "pipelines": [{"external-id": "b"}, {"external-id": "c"}]},
+                ],
+                "pipelines": [{"template": "missing", "external-id": "d"}],
+            }
+        )
+    assert [_e["loc"] for _e in e.value.errors()] == [
+        ("templates", "broken", "contacts", 0, "email"),
+        ("templates", "broken", "contacts", 0, "role"),
+        ("templates", "broken", "contacts", 0, "send-notification"),
+        ("templates", "broken", "unknown"),
+        ("pipelines", 0, "template"),
+        ("groups", 0, "pipelines", 1, "schedule"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "config",
+    sorted([*ROOT_DIRECTORY.glob("example/*.yml"), *ROOT_DIRECTORY.parent.glob("configs/*.yml")]),
+    ids=lambda _config: _config.name,
+)
+def test_yaml_loader_matches_safe_loader(config):
+    content = config.read_text()
+    assert yaml.load(content, Loader=YAML_LOADER) == yaml.load(content, Loader=yaml.SafeLoader)
+
+
+def test_model_ignores_envvars_and_validates_defaults(monkeypatch):
+    # fields are never populated from envvars, envvars are only expanded in the config file
+    monkeypatch.setenv("SCHEDULE", "Continuous")
+    with pytest.raises(ValidationError, match="schedule"):
+        Pipeline(data_set_id=1)
+
+    # defaults are validated, which adds the generated metadata
+    assert {"Dataops_created", "Dataops_source"} <= Pipeline(data_set_id=1, schedule="Continuous").metadata.keys()
@@ -1,10 +1,19 @@
+import time
 from pathlib import Path
 
 import pytest
+from cognite.client.credentials import OAuthClientCredentials
 from dependency_injector import containers, providers
+from pydantic import ValidationError
 from rich import print
 
-from extpipes.common.cognite_client import CogniteConfig
+from extpipes.common.cognite_client import (
+    HTTP_PRESETS,
+    CogniteConfig,
+    CogniteHttpConfig,
+    HttpPreset,
+    get_cognite_client,
+)
 
 
 def test_cognite_config_02_is_valid():
@@ -31,3 +40,48 @@ def test_cognite_config_02_is_valid():
     # or eval the dependency-injector way
     cognite_config = providers.Resource(CogniteConfig.model_validate, obj=config)
     print(cognite_config)
+
+
+def test_token_cache_is_shared_between_clients(tmp_path: Path, monkeypatch):
+    config = {
+        "host": "https://testfield.cognitedata.com/",
+        "project": "shiny-prod",
+        "idp-authentication": {
+            "client-id": "111111-2222-3333-4444-55555555",
+            "secret": "34534asdfadsg4445",
+            "scopes": ["https://testfield.cognitedata.com/.default"],
+            "token_url": "https://login.microsoftonline.com/31415-9265-359/oauth2/v2.0/token",
+            "token-cache": {"path": str(tmp_path)},
+        },
+    }
+    fetched = []
+
+    def fetch_token(self):
+        fetched.append(self.client_id)
+        return f"token-{len(fetched)}", time.time() + 3600
+
+    monkeypatch.setattr(OAuthClientCredentials, "_refresh_access_token", fetch_token)
+
+    cognite_config = CogniteConfig.model_validate(config)
+    # e.g. two parallel jobs on the same runner
+    for _ in range(2):
+        credentials = get_cognite_client(cognite_config).config.credentials
+        assert credentials.authorization_header() == ("Authorization", "Bearer token-1")
+    assert len(fetched) == 1
+
+    # the cached token can't be decrypted with another secret
+    config["idp-authentication"]["secret"] = "rotated"
+    credentials = get_cognite_client(CogniteConfig.model_validate(config)).config.credentials
+    assert credentials.authorization_header() == ("Authorization", "Bearer token-2")
+
+
+def test_http_presets_and_overrides():
+    http = CogniteHttpConfig.model_validate({"preset": "high-throughput", "timeout": 120})
+    assert http.max_workers == HTTP_PRESETS[HttpPreset.HIGH_THROUGHPUT]["max_workers"]
+    assert http.timeout == 120
+
+    # defaults to the cognite-sdk defaults
+    assert CogniteHttpConfig().max_workers == 10
+
+    with pytest.raises(ValidationError):
+        CogniteHttpConfig.model_validate({"max-workers": 100, "max-connection-pool-size": 10})
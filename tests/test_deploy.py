@@ -0,0 +1,89 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from cognite.client.data_classes import DataSet, DataSetList, ExtractionPipeline
+from pydantic import ValidationError
+
+from extpipes.app_config import CommandMode, Pipeline
+from extpipes.app_exceptions import ExtpipesConfigError, ExtpipesSupersededError
+from extpipes.commands.deploy import (
+    CommandDeploy,
+    PipelineRecord,
+    _chunked,
+    _fingerprint,
+)
+
+from .constants import ROOT_DIRECTORY
+
+
+def test_chunked():
+    assert list(_chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(_chunked([], 2)) == []
+
+
+def test_pipeline_record_is_compact():
+    requested = ExtractionPipeline(external_id="a", name="a", schedule="Continuous", metadata={"Dataops_created": "1"})
+    existing = ExtractionPipeline._load({"externalId": "a", "name": "a", "schedule": "Continuous", "id": 1})
+
+    record = PipelineRecord.from_extpipe(existing)
+    assert record.fingerprint == _fingerprint(requested)
+    with pytest.raises(AttributeError):
+        record.name = "no other attributes"
+
+
+def test_resolve_data_sets_reports_all_missing_and_skips_ids():
+    command = CommandDeploy(
+        config_path=ROOT_DIRECTORY / "example/config-deploy-example-01.1.yml",
+        command=CommandMode.DEPLOY,
+        debug=False,
+        dry_run=True,
+        dotenv_path=ROOT_DIRECTORY / "example/.env_mock",
+    )
+    command.extpipes_config.pipelines = [
+        Pipeline(external_id=f"p{_i}", data_set_external_id=_xid, schedule="Continuous")
+        for _i, _xid in enumerate(["a", "missing:1", "b", "missing:2", "a"])
+    ] + [Pipeline(external_id="p5", data_set_id=7, schedule="Continuous")]
+
+    with patch(
+        "cognite.client._api.data_sets.DataSetsAPI.retrieve_multiple",
+        return_value=DataSetList([DataSet(id=1, external_id="a"), DataSet(id=2, external_id="b")]),
+    ) as retrieve_multiple:
+        with pytest.raises(ExtpipesConfigError, match=r"\['missing:1', 'missing:2'\]"):
+            command.validate_config()
+    assert sorted(retrieve_multiple.call_args.kwargs["external_ids"]) == ["a", "b", "missing:1", "missing:2"]
+
+    # the resolved ids are kept for all later phases, ids from the config are not looked up
+    assert command.data_set_ids == {"a": 1, "b": 2}
+    pipelines = command.extpipes_config.pipelines
+    assert (command.data_set_id(pipelines[2]), command.data_set_id(pipelines[5])) == (2, 7)
+
+
+def test_pipeline_requires_one_data_set():
+    with pytest.raises(ValidationError, match="Either 'data-set-external-id' or 'data-set-id' is required"):
+        Pipeline(external_id="a", schedule="Continuous")
+    with pytest.raises(ValidationError, match="Either 'data-set-external-id' or 'data-set-id' is required"):
+        Pipeline(external_id="a", data_set_external_id="a", data_set_id=1, schedule="Continuous")
+
+
+def test_streaming_deploy_superseded_between_chunks():
+    command = CommandDeploy(
+        config_path=ROOT_DIRECTORY / "example/config-deploy-example-01.1.yml",
+        command=CommandMode.DEPLOY,
+        debug=False,
+        dry_run=False,
+        dotenv_path=ROOT_DIRECTORY / "example/.env_mock",
+    )
+    command.extpipes_config.pipelines = [
+        Pipeline(external_id=f"p{_i}", data_set_id=1, schedule="Continuous") for _i in range(3)
+    ]
+    command.extpipes_config.features.automatic_delete = False
+    command.client = MagicMock()
+    command.client.extraction_pipelines.retrieve_multiple.return_value = []
+    # a newer revision gets queued after the first chunk got applied
+    command.lock = MagicMock()
+    command.lock.is_superseded.side_effect = [False, False, True]
+
+    with patch.object(CommandDeploy, "ensure_raw_tables"):
+        with pytest.raises(ExtpipesSupersededError, match="stopped before applying further changes"):
+            command.command_streaming(chunk_size=2)
+    assert command.client.extraction_pipelines.create.call_count == 1
@@ -0,0 +1,71 @@
+import time
+from typing import Optional
+
+import pytest
+
+from extpipes.app_exceptions import ExtpipesLockError
+from extpipes.common.deploy_lock import DeployLock, FileLockBackend
+
+
+def make_lock(tmp_path, revision: Optional[int], **kwargs) -> DeployLock:
+    return DeployLock(FileLockBackend(tmp_path / "deploy.lock"), key="project", revision=revision, **kwargs)
+
+
+def test_newer_revision_supersedes_holder_and_waiting_runs(tmp_path):
+    holder = make_lock(tmp_path, revision=1)
+    assert holder.acquire()
+
+    # waits for the holder, until giving up, which removes its revision from the queue again
+    with pytest.raises(ExtpipesLockError, match="held by"):
+        make_lock(tmp_path, revision=2, wait_seconds=0).acquire()
+    assert not holder.is_superseded()
+
+    # a waiting run of revision 2 makes the holder obsolete, and older queued runs exit early
+    newest = make_lock(tmp_path, revision=2)
+    newest.backend.update("project", newest._announce)
+    assert holder.is_superseded()
+    assert not make_lock(tmp_path, revision=1).acquire()
+
+    holder.release()
+    assert newest.acquire()
+    assert not newest.is_superseded()
+    newest.release()
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    crashed = make_lock(tmp_path, revision=1)
+    crashed.backend.update("project", lambda _s: {"holder": "crashed", "expires_at": time.time() - 1})
+
+    lock = make_lock(tmp_path, revision=1)
+    assert lock.acquire()
+    assert lock.backend.read("project")["holder"] == lock.run_id
+    lock.release()
+    assert lock.backend.read("project")["holder"] is None
+
+
+def test_announced_revisions_end_with_their_runs(tmp_path):
+    # a run w/o revision neither supersedes nor gets superseded
+    unversioned = make_lock(tmp_path, revision=None)
+    assert unversioned.acquire()
+    assert not unversioned.is_superseded()
+    unversioned.release()
+
+    newest = make_lock(tmp_path, revision=1235)
+    assert newest.acquire()
+    newest.release()
+    assert newest.backend.read("project")["queue"] == {}
+
+    # once the newer run ended, older revisions are deployed again
+    later = make_lock(tmp_path, revision=1234)
+    assert later.acquire()
+    later.release()
+
+    # entries of crashed runs expire with their lease
+    crashed = make_lock(tmp_path, revision=2000)
+    crashed.backend.update(
+        "project", lambda _s: {"queue": {"crashed": {"revision": 2000, "expires_at": time.time() - 1}}}
+    )
+    lock = make_lock(tmp_path, revision=1236)
+    assert lock.acquire()
+    assert list(lock.backend.read("project")["queue"]) == [lock.run_id]
+    lock.release()
@@ -0,0 +1,39 @@
+from extpipes.app_config import CommandMode
+from extpipes.commands.diagram import (
+    CommandDiagram,
+    DiagramFormat,
+    NodeKind,
+    _MermaidWriter,
+)
+
+from .constants import ROOT_DIRECTORY
+
+
+def test_diagram_streams_each_node_once():
+    command = CommandDiagram(
+        ROOT_DIRECTORY / "example/config-deploy-example-01.1.yml",
+        command=CommandMode.DIAGRAM,
+        debug=False,
+        dry_run=True,
+        dotenv_path=ROOT_DIRECTORY / "example/.env_mock",
+    )
+
+    lines = list(command.command(format=DiagramFormat.MERMAID))
+    assert lines[0] == "graph LR\n"
+    nodes = [_line for _line in lines if "[" in _line]
+    # data set, pipeline, raw db, raw table and two contacts
+    assert len(nodes) == 6
+    assert len(set(nodes)) == len(nodes)
+
+    lines = list(command.command(format=DiagramFormat.DOT, with_contacts=False))
+    assert lines[-1] == "}\n"
+    assert not any("shape=ellipse" in _line for _line in lines)
+
+    # filters without a match result in an empty diagram
+    assert command.select_pipelines(data_sets=["src:001:sap"], raw_dbs=["unknown"]) == []
+    assert command.select_pipelines(external_id_patterns=["src:001:*"]) == [0]
+
+
+def test_mermaid_escapes_labels():
+    node = _MermaidWriter().node("n1", NodeKind.CONTACT, 'Jane "J" <jane@example.com> #1', None)
+    assert node == '  n1["Jane #quot;J#quot; #lt;jane@example.com#gt; #35;1"]:::contact\n'
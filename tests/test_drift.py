@@ -0,0 +1,132 @@
+import json
+import xml.etree.ElementTree as ET
+from unittest.mock import MagicMock
+
+import pytest
+from click.testing import CliRunner
+from cognite.client.data_classes import (
+    ExtractionPipeline,
+    ExtractionPipelineContact,
+    ExtractionPipelineList,
+)
+
+from extpipes.__main__ import DRIFT_DETECTED_EXIT_CODE, extpipes_cli
+from extpipes.app_config import CommandMode, Pipeline
+from extpipes.commands.base import changed_fields
+from extpipes.commands.drift import CommandDrift, DriftFormat, DriftStatus
+
+from .constants import ROOT_DIRECTORY
+
+
+def test_changed_fields_ignores_generated_metadata_and_order():
+    requested = ExtractionPipeline(
+        external_id="src:001:sap",
+        name="src:001:sap",
+        schedule="Continuous",
+        raw_tables=[{"dbName": "db", "tableName": "a"}, {"dbName": "db", "tableName": "b"}],
+        contacts=[
+            ExtractionPipelineContact(name="Fizz", email="fizz@cognite.com", role="admin", send_notification=True)
+        ],
+        metadata={"source": "sap", "Dataops_created": "2024-01-02 00:00:00"},
+    )
+    # as loaded from CDF
+    existing = ExtractionPipeline._load(
+        {
+            "externalId": "src:001:sap",
+            "name": "src:001:sap",
+            "schedule": "Continuous",
+            "rawTables": [{"dbName": "db", "tableName": "b"}, {"dbName": "db", "tableName": "a"}],
+            "contacts": [{"name": "Fizz", "email": "fizz@cognite.com", "role": "admin", "sendNotification": True}],
+            "metadata": {"source": "sap", "Dataops_created": "2023-01-01 00:00:00"},
+        }
+    )
+    assert changed_fields(requested, existing) == []
+
+    existing.schedule = "@hourly"
+    existing.metadata = {"source": "sap2"}
+    assert changed_fields(requested, existing) == ["schedule", "metadata"]
+
+
+def test_drift_report_formats():
+    report = {
+        "project": "shiny-prod",
+        "checked": ["a", "b"],
+        "drifted": [{"external_id": "b", "status": "changed", "fields": ["schedule"]}],
+    }
+
+    assert json.loads(CommandDrift.render(report, DriftFormat.JSON)) == report
+
+    testsuite = ET.fromstring(CommandDrift.render(report, DriftFormat.JUNIT))
+    assert testsuite.get("tests") == "2"
+    assert testsuite.get("failures") == "1"
+    assert [_f.text for _f in testsuite.iter("failure")] == ["schedule"]
+
+
+@pytest.mark.parametrize("automatic_delete", [False, True])
+def test_drift_command(automatic_delete):
+    command = CommandDrift(
+        config_path=ROOT_DIRECTORY / "example/config-deploy-example-01.1.yml",
+        command=CommandMode.DRIFT,
+        debug=False,
+        dry_run=False,
+        dotenv_path=ROOT_DIRECTORY / "example/.env_mock",
+    )
+    command.extpipes_config.pipelines = [
+        Pipeline(external_id=_xid, data_set_id=1, schedule="Continuous") for _xid in ["missing", "changed", "same"]
+    ]
+    command.extpipes_config.features.automatic_delete = automatic_delete
+    command.default_contacts = []
+
+    changed, same = (command.render_extpipe(_p) for _p in command.extpipes_config.pipelines[1:])
+    changed.schedule = "@hourly"
+    existing = ExtractionPipelineList([changed, same])
+    command.client = MagicMock()
+    command.client.extraction_pipelines.retrieve_multiple.return_value = existing
+    command.client.extraction_pipelines.list.return_value = ExtractionPipelineList(
+        [*existing, ExtractionPipeline(external_id="unmanaged")]
+    )
+
+    report = command.command()
+
+    expected = [
+        {"external_id": "missing", "status": DriftStatus.MISSING, "fields": []},
+        {"external_id": "changed", "status": DriftStatus.CHANGED, "fields": ["schedule"]},
+    ]
+    if automatic_delete:
+        # all extpipes of the project are listed, to find the unmanaged ones
+        command.client.extraction_pipelines.retrieve_multiple.assert_not_called()
+        assert report["checked"] == ["missing", "changed", "same", "unmanaged"]
+        expected.append({"external_id": "unmanaged", "status": DriftStatus.UNMANAGED, "fields": []})
+    else:
+        # only the configured extpipes are looked up
+        command.client.extraction_pipelines.list.assert_not_called()
+        assert command.client.extraction_pipelines.retrieve_multiple.call_args.kwargs["external_ids"] == [
+            "missing",
+            "changed",
+            "same",
+        ]
+        assert report["checked"] == ["missing", "changed", "same"]
+    assert report["drifted"] == expected
+
+
+def test_drift_cli_exit_code(restore_session):
+    result = CliRunner().invoke(
+        extpipes_cli,
+        [
+            "--dotenv-path",
+            str(ROOT_DIRECTORY / "example/.env_mock"),
+            "--replay",
+            str(ROOT_DIRECTORY / "example/recording-deploy-example-01.1.jsonl"),
+            "--replay-latency-scale",
+            "0",
+            "drift",
+            str(ROOT_DIRECTORY / "example/config-deploy-example-01.1.yml"),
+        ],
+    )
+
+    assert result.exit_code == DRIFT_DETECTED_EXIT_CODE
+    report = json.loads(result.stdout)
+    assert [(_d["external_id"], _d["status"]) for _d in report["drifted"]] == [
+        ("src:001:sap:sap_funcloc:continuous", "changed"),
+        ("src:001:sap:unconfigured", "unmanaged"),
+    ]
@@ -0,0 +1,47 @@
+from click.testing import CliRunner
+
+from extpipes.__main__ import extpipes_cli
+from extpipes.app_config import CommandMode
+from extpipes.commands.deploy import CommandDeploy
+from extpipes.common.http_recording import _endpoint, _scrub
+
+from .constants import ROOT_DIRECTORY
+
+
+def test_scrub_and_endpoint():
+    assert _scrub({"clientSecret": "s", "items": [{"token": "t", "name": "n"}]}) == {
+        "clientSecret": "***",
+        "items": [{"token": "***", "name": "n"}],
+    }
+    assert (
+        _endpoint("GET", "https://api.cognitedata.com/api/v1/projects/my-project/raw/dbs?limit=1000&cursor=a")
+        == "GET /api/v1/projects/<project>/raw/dbs?cursor=a&limit=1000"
+    )
+
+
+def test_replay_deploy(restore_session):
+    command = CommandDeploy(
+        config_path=ROOT_DIRECTORY / "example/config-deploy-example-01.1.yml",
+        command=CommandMode.DEPLOY,
+        debug=False,
+        dry_run=False,
+        dotenv_path=ROOT_DIRECTORY / "example/.env_mock",
+        replay_path=ROOT_DIRECTORY / "example/recording-deploy-example-01.1.jsonl",
+        replay_latency_scale=0,
+    )
+    # the replaying adapter keeps the SDK's settings, w/o retries of its own
+    assert command.transport.max_retries.total is False
+    command.validate_config()
+    command.command()
+
+    # every recorded request was sent again, incl. the update with a new 'Dataops_created' timestamp
+    assert command.transport.unused == 0
+
+
+def test_record_and_replay_are_exclusive(tmp_path):
+    recording = str(ROOT_DIRECTORY / "example/recording-deploy-example-01.1.jsonl")
+    result = CliRunner().invoke(
+        extpipes_cli, ["--record", str(tmp_path / "recording.jsonl"), "--replay", recording, "deploy"]
+    )
+    assert result.exit_code == 2
+    assert "can't be used together" in result.output
@@ -0,0 +1,63 @@
+import json
+import logging
+
+from extpipes.common.logging_utils import (
+    JsonFormatter,
+    enable_queue_logging,
+    lazy,
+    stop_queue_logging,
+    summarize,
+)
+
+
+def test_summarize_large_collections():
+    assert summarize(["a", "b"]) == "['a', 'b']"
+    assert summarize(list(range(100)), max_items=3) == "[0, 1, 2] ... (+97 more, 100 total)"
+    assert summarize({_i: _i for _i in range(5)}, max_items=2) == "{0: 0, 1: 1} ... (+3 more, 5 total)"
+
+
+def test_lazy_payload_only_computed_if_written(caplog):
+    computed = []
+
+    def payload():
+        computed.append(True)
+        return ["a"]
+
+    logger = logging.getLogger("extpipes-test-lazy")
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        logger.debug("payload: %s", lazy(payload))
+        assert not computed
+        logger.info("payload: %s", lazy(payload))
+    assert computed
+    assert "payload: ['a']" in caplog.text
+
+
+def test_queue_logging_with_json_output(tmp_path):
+    logger = logging.getLogger("extpipes-test-queue")
+    logger.propagate = False
+    handler = logging.FileHandler(tmp_path / "log.jsonl")
+    handler.setFormatter(JsonFormatter())
+    logger.addHandler(handler)
+    try:
+        enable_queue_logging()
+        logger.warning("queued %s", "message")
+        try:
+            raise ValueError("failed")
+        except ValueError:
+            logger.exception("with %s", "exception")
+        assert handler not in logger.handlers
+        # flushes the queue, and restores the handler
+        stop_queue_logging()
+        assert logger.handlers == [handler]
+    finally:
+        logger.handlers.clear()
+        handler.close()
+
+    entry, exception_entry = map(json.loads, (tmp_path / "log.jsonl").read_text().splitlines())
+    assert entry["message"] == "queued message"
+    assert entry["level"] == "WARNING"
+    assert "exception" not in entry
+    # the traceback is kept apart from the message
+    assert exception_entry["message"] == "with exception"
+    assert exception_entry["exception"].startswith("Traceback")
+    assert "ValueError: failed" in exception_entry["exception"]
@@ -0,0 +1,92 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from cognite.client.data_classes import ExtractionPipeline, ExtractionPipelineList
+from pydantic import ValidationError
+
+from extpipes.app_config import CommandMode
+from extpipes.commands.query import CommandQuery, IndexKind, PipelineIndex
+from extpipes.common.config_cache import ConfigCache
+from extpipes.common.reports import ReportFormat
+
+from .constants import ROOT_DIRECTORY
+
+
+def build_index() -> PipelineIndex:
+    index = PipelineIndex()
+    index.add("a", "ds:1", "Continuous", [("db", "t1"), ("db", "t2")], ["x@cognite.com"], {"source": "sap"})
+    index.add("b", "ds:1", "@hourly", [("db", "t2")], ["y@cognite.com"], {"source": "sap", "Dataops_source": "cli"})
+    index.add("c", "ds:2", "@hourly", [], ["x@cognite.com"], {})
+    return index
+
+
+def test_index_select():
+    index = build_index()
+    assert [_r[0] for _r in index.select({})] == ["a", "b", "c"]
+    assert [_r[0] for _r in index.select({IndexKind.RAW_TABLE: ["db/t2"]})] == ["a", "b"]
+    assert [_r[0] for _r in index.select({IndexKind.METADATA: ["source=sap"], IndexKind.SCHEDULE: ["@hourly"]})] == [
+        "b"
+    ]
+    assert [_r[0] for _r in index.select({IndexKind.CONTACT: ["x@cognite.com", "y@cognite.com"]})] == ["a", "b", "c"]
+    # generated metadata is not indexed
+    assert index.select({IndexKind.METADATA: ["Dataops_source"]}) == []
+
+
+def test_query_merges_config_and_live():
+    live_index = PipelineIndex()
+    live_index.add("c", "ds:2", "@hourly", [], [], {})
+    live_index.add("d", "ds:2", "@daily", [], [], {})
+
+    report = CommandQuery.query(build_index(), {IndexKind.DATA_SET: ["ds:2"]}, live_index)
+    assert report["pipelines"] == [
+        {"external_id": "c", "data_set": "ds:2", "schedule": "@hourly", "config": True, "cdf": True},
+        {"external_id": "d", "data_set": "ds:2", "schedule": "@daily", "config": False, "cdf": True},
+    ]
+    assert json.loads(CommandQuery.render(report, ReportFormat.JSON)) == report
+    assert "in CDF" in CommandQuery.render(report, ReportFormat.TABLE)
+
+
+def test_index_is_cached_per_config_and_environment(tmp_path, monkeypatch):
+    config_path = tmp_path / "config.yml"
+    config_path.write_text("cognite:\n  project: ${CDF_PROJECT}\n  secret: ${CDF_CLIENT_SECRET}\n")
+    monkeypatch.setenv("CDF_PROJECT", "a")
+
+    cache = ConfigCache(config_path, kind="query-index")
+    assert cache.load() is None
+    cache.save(build_index().dump())
+    index = PipelineIndex.load(ConfigCache(config_path, kind="query-index").load())
+    assert index and index.select({IndexKind.DATA_SET: ["ds:1"]}) == build_index().select(
+        {IndexKind.DATA_SET: ["ds:1"]}
+    )
+
+    # secrets are not part of the key, other environment variables are
+    monkeypatch.setenv("CDF_CLIENT_SECRET", "rotated")
+    assert ConfigCache(config_path, kind="query-index").key == cache.key
+    monkeypatch.setenv("CDF_PROJECT", "b")
+    assert ConfigCache(config_path, kind="query-index").load() is None
+
+
+def test_live_index_only_uses_the_cognite_config(tmp_path):
+    # an invalid 'extpipes' section, which is not validated as long as the config index is cached
+    example = (ROOT_DIRECTORY / "example/config-deploy-example-01.1.yml").read_text()
+    config_path = tmp_path / "config.yml"
+    config_path.write_text(example.replace("schedule: Continuous", "schedule: sometimes", 1))
+
+    command = CommandQuery(
+        config_path,
+        command=CommandMode.QUERY,
+        debug=False,
+        dry_run=False,
+        dotenv_path=ROOT_DIRECTORY / "example/.env_mock",
+    )
+    command.client = MagicMock()
+    command.client.extraction_pipelines.list.return_value = ExtractionPipelineList(
+        [ExtractionPipeline(external_id="a", data_set_id=1)]
+    )
+    command.client.data_sets.retrieve_multiple.return_value = []
+    assert [_r[0] for _r in command.build_live_index().select({})] == ["a"]
+
+    # validated on first use, e.g. to build the config index
+    with pytest.raises(ValidationError, match="schedule"):
+        command.build_config_index()
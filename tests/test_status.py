@@ -0,0 +1,100 @@
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from cognite.client.data_classes import ExtractionPipeline, ExtractionPipelineList
+
+from extpipes.app_config import CommandMode, Contact, Pipeline
+from extpipes.commands.status import (
+    CommandStatus,
+    RunStatus,
+    _schedule_interval,
+    latest_run,
+)
+
+from .constants import ROOT_DIRECTORY
+
+
+@pytest.mark.parametrize(
+    "schedule, expected",
+    [
+        ("On trigger", None),
+        ("Continuous", None),
+        ("@reboot", None),
+        ("@hourly", timedelta(hours=1)),
+        ("@every 1h30m", timedelta(hours=1, minutes=30)),
+        ("*/15 * * * *", timedelta(minutes=15)),
+        ("0 * * * *", timedelta(hours=1)),
+        ("0 6,18 * * *", timedelta(hours=12)),
+        ("30 8-17 * * *", timedelta(hours=15)),
+        ("0 0 * * 1", timedelta(days=7)),
+        ("0 0 0 1,15 * *", timedelta(days=17)),
+        ("0 8-17/2 * * *", timedelta(hours=16)),
+        ("5/20 * * * *", timedelta(minutes=20)),
+        # accepted by the config pattern, but not valid cron
+        ("*/0 * * * *", None),
+        ("Continuous foo", None),
+    ],
+)
+def test_schedule_interval(schedule, expected):
+    assert _schedule_interval(schedule) == expected
+
+
+def test_latest_run():
+    assert latest_run(None) == (RunStatus.MISSING, None)
+    assert latest_run(ExtractionPipeline(external_id="a")) == (RunStatus.NEVER, None)
+    assert latest_run(ExtractionPipeline(external_id="a", last_success=1, last_failure=3, last_seen=2)) == (
+        RunStatus.FAILURE,
+        3,
+    )
+
+
+def test_status_command():
+    command = CommandStatus(
+        config_path=ROOT_DIRECTORY / "example/config-deploy-example-01.1.yml",
+        command=CommandMode.STATUS,
+        debug=False,
+        dry_run=False,
+        dotenv_path=ROOT_DIRECTORY / "example/.env_mock",
+    )
+    fizz = Contact(name="Fizz", email="fizz@cognite.com", role="admin", send_notification=False)
+    command.extpipes_config.pipelines = [
+        Pipeline(external_id="on-time", data_set_external_id="ds:a", schedule="@hourly", contacts=[fizz]),
+        Pipeline(external_id="in-grace", data_set_external_id="ds:a", schedule="@hourly"),
+        Pipeline(external_id="late", data_set_external_id="ds:a", schedule="@hourly"),
+        Pipeline(external_id="never", data_set_id=7, schedule="@hourly", contacts=[fizz]),
+        Pipeline(external_id="missing", data_set_id=7, schedule="@hourly"),
+        Pipeline(external_id="continuous", data_set_id=7, schedule="Continuous"),
+    ]
+    minutes_ago = lambda _m: int((time.time() - _m * 60) * 1000)  # noqa: E731
+    existing = ExtractionPipelineList(
+        [
+            ExtractionPipeline(external_id="on-time", last_success=minutes_ago(30)),
+            # within the schedule plus 10 minutes grace
+            ExtractionPipeline(external_id="in-grace", last_seen=minutes_ago(65)),
+            ExtractionPipeline(external_id="late", last_success=minutes_ago(90), last_failure=minutes_ago(80)),
+            ExtractionPipeline(external_id="never"),
+            ExtractionPipeline(external_id="continuous", last_failure=minutes_ago(600)),
+        ]
+    )
+
+    with patch(
+        "cognite.client._api.extractionpipelines.ExtractionPipelinesAPI.retrieve_multiple", return_value=existing
+    ) as retrieve_multiple:
+        report = command.command(grace=timedelta(minutes=10))
+    assert retrieve_multiple.call_args.kwargs["external_ids"] == [
+        _p.external_id for _p in command.extpipes_config.pipelines
+    ]
+
+    assert report["data_sets"] == {
+        "ds:a": {"success": 1, "seen": 1, "failure": 1, "late": 1},
+        "7": {"never": 1, "missing": 1, "failure": 1, "late": 1},
+    }
+    # default contacts count for all pipelines
+    assert report["contacts"] == {
+        "fizz@cognite.com": {"success": 1, "never": 1, "late": 1},
+        "yours.truly@cognite.com": {"success": 1, "seen": 1, "failure": 2, "never": 1, "missing": 1, "late": 2},
+    }
+    # missing extpipes are not late, but reported as missing
+    assert [(_l["external_id"], _l["last_run"] is None) for _l in report["late"]] == [("late", False), ("never", True)]